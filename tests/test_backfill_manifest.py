@@ -0,0 +1,20 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from ziki_helpers.toast_api.backfill_manifest import LocalBackfillManifest
+
+
+def test_backfill_manifest_resume(tmp_path):
+    path = str(tmp_path / 'orders' / '20230801_20230831.json')
+
+    manifest = LocalBackfillManifest(path).load()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda date: manifest.mark_done(date, 'guid-a', 10), range(20230801, 20230817)))
+
+    resumed = LocalBackfillManifest(path).load()
+    assert resumed.is_done(20230816, 'guid-a')
+    assert not resumed.is_done(20230816, 'guid-b')
+    assert not resumed.is_done(20230817, 'guid-a')
+    assert len(resumed.done) == 16
+
+    resumed.delete()
+    assert LocalBackfillManifest(path).load().done == {}
@@ -0,0 +1,25 @@
+from ziki_helpers.toast_api.dedup import dedupe_by_guid, StreamingDeduper
+
+
+def test_dedupe_by_guid():
+    data = [
+        {'guid': 'a', 'modifiedDate': '2023-08-01T10:00:00.000+0000', 'hours': 1},
+        {'guid': 'b', 'modifiedDate': '2023-08-01T10:00:00.000+0000'},
+        {'guid': 'a', 'modifiedDate': '2023-08-02T10:00:00.000+0000', 'hours': 2},
+        {'guid': 'a', 'modifiedDate': '2023-08-01T09:00:00.000+0000', 'hours': 0},
+    ]
+    unique = dedupe_by_guid(data)
+
+    assert [entry['guid'] for entry in unique] == ['a', 'b']
+    assert unique[0]['hours'] == 2
+
+
+def test_streaming_deduper_ignores_key_order():
+    records = [
+        {'guid': 'a', 'name': 'Cook', 'wage': 15},
+        {'wage': 15, 'name': 'Cook', 'guid': 'a'},
+        {'guid': 'a', 'name': 'Cook', 'wage': 16},
+        {'guid': None, 'name': 'Placeholder'},
+        {'guid': None, 'name': 'Placeholder'},
+    ]
+    assert list(StreamingDeduper().filter(records)) == [records[0], records[2], records[3]]
@@ -0,0 +1,42 @@
+from decimal import Decimal
+
+from ziki_helpers.toast_api.digest_index import LocalDigestIndex, content_digest
+
+
+def test_content_digest_ignores_key_order():
+    assert content_digest({'guid': 'a', 'amount': Decimal('1.50')}) == content_digest({'amount': Decimal('1.50'), 'guid': 'a'})
+    assert content_digest({'guid': 'a', 'amount': Decimal('1.50')}) != content_digest({'guid': 'a', 'amount': Decimal('1.51')})
+
+
+def test_digest_index_skips_unchanged(tmp_path):
+    path = str(tmp_path / 'orders.json.gz')
+    records = [{'guid': 'a', 'amount': 1}, {'guid': 'b', 'amount': 2}, {'amount': 3}]
+
+    index = LocalDigestIndex(path).load()
+    assert all(index.should_write(record) for record in records)
+    index.commit()
+    index.save()
+
+    index = LocalDigestIndex(path).load()
+    changed = {'guid': 'b', 'amount': 5}
+    assert [index.should_write(record) for record in records + [changed]] == [False, False, True, True]
+    assert (index.written, index.skipped) == (2, 2)
+
+
+def test_digest_index_only_saves_committed_groups(tmp_path):
+    path = str(tmp_path / 'orders.json.gz')
+
+    index = LocalDigestIndex(path).load()
+    assert index.should_write({'guid': 'a', 'amount': 1}, 'location-1')
+    assert index.should_write({'guid': 'b', 'amount': 2}, 'location-2')
+    # Same record again within the run is skipped before it's committed
+    assert not index.should_write({'guid': 'a', 'amount': 1}, 'location-1')
+    index.commit('location-1')
+    # Nothing is uploaded until the end of the run
+    assert LocalDigestIndex(path).load().entries == dict()
+    index.save()
+
+    # location-2 never finished, so its record is written again next run
+    index = LocalDigestIndex(path).load()
+    assert not index.should_write({'guid': 'a', 'amount': 1}, 'location-1')
+    assert index.should_write({'guid': 'b', 'amount': 2}, 'location-2')
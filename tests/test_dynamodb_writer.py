@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+from botocore.exceptions import ClientError
+
+from ziki_helpers.toast_api import dynamodb_writer
+from ziki_helpers.toast_api.dynamodb_writer import ThrottledBatchWriter, WriteController, INITIAL_RATE
+
+
+class FakeClient:
+    """batch_write_item that throttles once, then leaves part of the next batch unprocessed."""
+
+    def __init__(self):
+        self.calls = 0
+        self.written = []
+
+    def batch_write_item(self, RequestItems, ReturnConsumedCapacity):
+        self.calls += 1
+        (table_name, requests), = RequestItems.items()
+        if self.calls == 1:
+            raise ClientError({'Error': {'Code': 'ProvisionedThroughputExceededException'}}, 'BatchWriteItem')
+        if self.calls == 2:
+            processed, unprocessed = requests[:-5], requests[-5:]
+        else:
+            processed, unprocessed = requests, []
+        self.written += [request['PutRequest']['Item'] for request in processed]
+        return {
+            'UnprocessedItems': {table_name: unprocessed} if unprocessed else {},
+            'ConsumedCapacity': [{'TableName': table_name, 'CapacityUnits': float(len(processed))}],
+        }
+
+
+def test_throttled_batch_writer(monkeypatch):
+    monkeypatch.setattr(dynamodb_writer, 'backoff_seconds', lambda attempt: 0.0)
+    client = FakeClient()
+    table = SimpleNamespace(name='orders', meta=SimpleNamespace(client=client))
+    controller = WriteController('orders')
+
+    with ThrottledBatchWriter(table, controller) as batch:
+        for i in range(60):
+            batch.put_item(Item={'guid': str(i)})
+
+    assert sorted(item['guid'] for item in client.written) == sorted(str(i) for i in range(60))
+    summary = controller.summary()
+    assert summary['items'] == 60
+    assert summary['consumed_wcu'] == 60
+    assert summary['throttle_events'] == 2
+    assert summary['unprocessed_items'] == 25 + 5
+    assert controller.rate < INITIAL_RATE
+
+
+def test_overwrite_by_pkeys():
+    client = FakeClient()
+    client.calls = 2
+    table = SimpleNamespace(name='orders', meta=SimpleNamespace(client=client))
+
+    with ThrottledBatchWriter(table, WriteController('orders'), overwrite_by_pkeys=['guid']) as batch:
+        batch.put_item(Item={'guid': 'a', 'v': 1})
+        batch.put_item(Item={'guid': 'a', 'v': 2})
+
+    assert client.written == [{'guid': 'a', 'v': 2}]
+
+
+class LargeItemsClient:
+    """batch_write_item where every item costs 4 WCU."""
+
+    def __init__(self):
+        self.written = []
+
+    def batch_write_item(self, RequestItems, ReturnConsumedCapacity):
+        (table_name, requests), = RequestItems.items()
+        self.written += [request['PutRequest']['Item'] for request in requests]
+        return {'ConsumedCapacity': [{'TableName': table_name, 'CapacityUnits': 4.0 * len(requests)}]}
+
+
+def test_write_controller_paces_by_consumed_wcu():
+    table = SimpleNamespace(name='orders', meta=SimpleNamespace(client=LargeItemsClient()))
+    controller = WriteController('orders', initial_rate=10.0)
+
+    with ThrottledBatchWriter(table, controller) as batch:
+        for i in range(25):
+            batch.put_item(Item={'guid': str(i)})
+
+    assert controller.wcu_per_item == 4.0
+    # The batch took 25 WCU up front and owes the other 75, the next writer waits it off
+    assert controller.bucket.tokens < 0
@@ -0,0 +1,213 @@
+import asyncio
+import datetime as dt
+from decimal import Decimal
+
+import pytest
+
+from ziki_helpers.toast_api.connector import (
+    ToastConnector, orders_path, labor_base_path, menu_path, menu_items_path, last_updated_path,
+)
+from ziki_helpers.toast_api.http_client import ToastHTTPClient
+from ziki_helpers.toast_api.async_connector import fetch_for_locations
+from ziki_helpers.toast_api.menu_cache import LocalMenuCache
+from ziki_helpers.toast_api.fake_server import FakeToastServer, FakeToastData, FAKE_TOAST_TOKEN, parse_toast_datetime
+
+
+@pytest.fixture
+def fake_server():
+    with FakeToastServer(FakeToastData(locations=2, orders_per_day=250, menu_items=250)) as server:
+        yield server
+
+
+def fake_connector(server: FakeToastServer, **kwargs) -> ToastConnector:
+    kwargs.setdefault('persistent_menu_cache', False)
+    return ToastConnector(http_client=ToastHTTPClient(), toast_token=FAKE_TOAST_TOKEN, api_server=server.url, **kwargs)
+
+
+def test_orders_pagination(fake_server):
+    conn = fake_connector(fake_server)
+    location_guid = fake_server.data.locations[0]
+
+    pages = list(conn.iter_orders_by_business_date(20230801, location_guid))
+    assert [len(page) for page in pages] == [100, 100, 50]
+
+    prefetched = conn.get_orders_by_business_date(20230801, location_guid, prefetch=3)
+    assert [order['guid'] for order in prefetched] == [order['guid'] for page in pages for order in page]
+
+
+def test_labor_windows(fake_server):
+    conn = fake_connector(fake_server)
+    location_guid = fake_server.data.locations[0]
+
+    start = dt.datetime(2023, 7, 1, tzinfo=dt.timezone.utc)
+    end = dt.datetime(2023, 9, 1, tzinfo=dt.timezone.utc)
+    data = conn.get_labor_between_times(start, end, location_guid)
+
+    assert data
+    assert len({entry['guid'] for entry in data}) == len(data)
+
+
+def test_labor_window_edges(fake_server):
+    conn = fake_connector(fake_server)
+    location_guid = fake_server.data.locations[0]
+
+    # Put a window edge right on an entry's modifiedDate, so both windows return it
+    modified = parse_toast_datetime(fake_server.data.labor_for_date(location_guid, 20230801)[0]['modifiedDate'])
+    start = modified - dt.timedelta(days=30)
+    end = modified + dt.timedelta(days=1)
+
+    streamed = [entry for page in conn.iter_labor_between_times(start, end, location_guid) for entry in page]
+    assert len({entry['guid'] for entry in streamed}) == len(streamed)
+    listed = conn.get_labor_between_times(start, end, location_guid)
+    assert {entry['guid']: entry for entry in streamed} == {entry['guid']: entry for entry in listed}
+
+
+def test_labor_window_edges_keep_latest(fake_server, monkeypatch):
+    conn = fake_connector(fake_server)
+    windows = iter([
+        [{'guid': 'a', 'modifiedDate': '2023-08-01T10:00:00.000+0000', 'hours': 1},
+         {'guid': 'b', 'modifiedDate': '2023-08-01T10:00:00.000+0000', 'hours': 1}],
+        [{'guid': 'a', 'modifiedDate': '2023-08-02T10:00:00.000+0000', 'hours': 2},
+         {'guid': 'b', 'modifiedDate': '2023-08-01T10:00:00.000+0000', 'hours': 1}],
+    ])
+    monkeypatch.setattr(conn, '_get_labor_window', lambda *args: next(windows))
+    start = dt.datetime(2023, 7, 1, tzinfo=dt.timezone.utc)
+    end = start + dt.timedelta(days=45)
+
+    pages = list(conn.iter_labor_between_times(start, end, fake_server.data.locations[0]))
+    # The unchanged copy of b isn't repeated, the newer copy of a is, so the last write is the latest copy
+    assert [[entry['guid'] for entry in page] for page in pages] == [['a', 'b'], ['a']]
+    assert pages[-1][0]['hours'] == 2
+
+
+def test_menu_items_page_token(fake_server):
+    conn = fake_connector(fake_server)
+    location_guid = fake_server.data.locations[0]
+
+    data = conn.get_menu_items_by_after_datetime(dt.datetime(2015, 12, 1), location_guid)
+    assert len(data) == 250
+
+
+def test_rate_limit_retries():
+    with FakeToastServer(FakeToastData(locations=1), rate_limit_probability=0.5, retry_after=0.01) as server:
+        conn = fake_connector(server)
+        data = conn.get_orders_by_business_date(20230801, server.data.locations[0])
+
+        assert len(data) == 250
+        assert sum(count for (path, status), count in server.request_counts.items() if status == 429) > 0
+
+        totals = conn.metrics.snapshot()['totals']
+        assert totals['rate_limited'] > 0
+        assert totals['rate_limit_wait_seconds'] > 0
+        assert totals['error_backoff_seconds'] == 0
+
+
+def test_metrics(fake_server, tmp_path):
+    conn = fake_connector(fake_server)
+    location_guid = fake_server.data.locations[0]
+    conn.get_orders_by_business_date(20230801, location_guid)
+
+    snapshot = conn.metrics.snapshot()
+    orders = snapshot['endpoints']['/orders/v2/ordersBulk']
+    assert orders['requests'] == 3
+    assert orders['pages'] == 3
+    assert orders['bytes_received'] > 0
+    assert snapshot['locations'][0]['location'] == location_guid
+
+    conn.write_metrics(str(tmp_path / 'metrics.json'))
+    assert (tmp_path / 'metrics.json').exists()
+
+
+def test_decimal_floats(fake_server):
+    location_guid = fake_server.data.locations[0]
+    orders = fake_connector(fake_server).get_orders_by_business_date(20230801, location_guid)
+    decimal_orders = fake_connector(fake_server, decimal_floats=True).get_orders_by_business_date(20230801, location_guid)
+
+    check = decimal_orders[0]['checks'][0]
+    assert isinstance(check['amount'], Decimal)
+    assert check['amount'] == Decimal(str(orders[0]['checks'][0]['amount']))
+    assert not any(isinstance(value, float) for value in check['payments'][0].values())
+
+
+def test_fetch_for_locations():
+    with FakeToastServer(FakeToastData(locations=4, orders_per_day=150), latency=0.05) as server:
+        locations = server.data.locations
+        conn = fake_connector(server)
+
+        results = fetch_for_locations(conn, 'get_orders_by_business_date', locations, 20230801, max_concurrency=4)
+
+        assert list(results) == locations
+        assert all(len(orders) == 150 for orders in results.values())
+        assert len({order['guid'] for orders in results.values() for order in orders}) == 4 * 150
+        # Locations were in flight together, never more than max_concurrency (no prefetch, one request per location)
+        assert 1 < server.peak_in_flight <= 4
+
+        # Works from inside a running event loop too
+        async def in_loop():
+            return fetch_for_locations(conn, 'get_orders_by_business_date', locations, 20230801)
+        assert asyncio.run(in_loop()).keys() == results.keys()
+
+
+def test_max_in_flight():
+    with FakeToastServer(FakeToastData(locations=4, orders_per_day=50), latency=0.05) as server:
+        conn = ToastConnector(
+            http_client=ToastHTTPClient(max_in_flight=1), persistent_menu_cache=False,
+            toast_token=FAKE_TOAST_TOKEN, api_server=server.url,
+        )
+
+        fetch_for_locations(conn, 'get_orders_by_business_date', server.data.locations, 20230801, max_concurrency=4)
+        # One request at a time, however many locations are fanned out
+        assert server.peak_in_flight == 1
+        assert server.request_counts[(orders_path, 200)] == 4
+
+
+def test_persistent_menu_cache(fake_server, tmp_path):
+    location_guid = fake_server.data.locations[0]
+    cache_dir = str(tmp_path / 'menu_cache')
+
+    menu = fake_connector(fake_server, persistent_menu_cache=LocalMenuCache(cache_dir)).get_menu(location_guid)
+    assert fake_server.request_counts[(menu_path, 200)] == 1
+
+    # A new connector (ie: the next run) only checks the metadata while the menu is unchanged
+    cached = fake_connector(fake_server, persistent_menu_cache=LocalMenuCache(cache_dir)).get_menu(location_guid)
+    assert cached == menu
+    assert fake_server.request_counts[(menu_path, 200)] == 1
+    assert fake_server.request_counts[(last_updated_path, 200)] == 2
+
+    # The menu changed, so it's fetched again
+    fake_server.data.last_updated = '2023-06-01T00:00:00.000+0000'
+    refreshed = fake_connector(fake_server, persistent_menu_cache=LocalMenuCache(cache_dir)).get_menu(location_guid)
+    assert refreshed['lastUpdated'] == fake_server.data.last_updated
+    assert fake_server.request_counts[(menu_path, 200)] == 2
+
+
+def test_item_names_resolve_only_misses(fake_server):
+    conn = fake_connector(fake_server)
+    location_guid = fake_server.data.locations[0]
+    known = [item['guid'] for item in fake_server.data.menu_items(location_guid)[:10]]
+
+    names = conn.get_item_names_from_guids(known, location_guid)
+    assert names == {guid: f'Item {i}' for i, guid in enumerate(known)}
+
+    # Items added after the sync aren't in the dictionary yet, only those are fetched one by one
+    fake_server.data.menu_item_count += 3
+    new = [item['guid'] for item in fake_server.data.menu_items(location_guid)[-3:]]
+    names = conn.get_item_names_from_guids(known + new, location_guid)
+    assert [names[guid] for guid in new] == ['Item 250', 'Item 251', 'Item 252']
+
+    single_item_requests = {
+        path: count for (path, status), count in fake_server.request_counts.items() if path.startswith(menu_items_path + '/')
+    }
+    assert single_item_requests == {f'{menu_items_path}/{guid}': 1 for guid in new}
+
+
+def test_labor_mappings_chunks():
+    with FakeToastServer(FakeToastData(locations=1, employees=250)) as server:
+        conn = fake_connector(server)
+        employee_guids = [employee['guid'] for employee in server.data.labor_mappings(server.data.locations[0], 'employees')]
+
+        # The fake server rejects more than 100 IDs per query, like Toast
+        data = conn.get_labor_mappings('employees', server.data.locations[0], ids=employee_guids + employee_guids[:5])
+        assert sorted(employee['guid'] for employee in data) == sorted(employee_guids)
+        assert server.request_counts[(labor_base_path + '/employees', 200)] == 3
+        assert server.request_counts[(labor_base_path + '/employees', 400)] == 0
@@ -0,0 +1,21 @@
+from ziki_helpers.toast_api.json_store import LocalJSONStore
+
+
+def test_local_json_store(tmp_path):
+    path = str(tmp_path / 'state' / 'orders.json.gz')
+    store = LocalJSONStore(path, compress=True)
+    assert store.load() is None
+
+    store.save({'a': [1, 2]})
+    assert open(path, 'rb').read()[:2] == b'\x1f\x8b'
+    assert LocalJSONStore(path).load() == {'a': [1, 2]}
+
+    store.delete()
+    store.delete()
+    assert store.load() is None
+
+
+def test_local_json_store_partial_file(tmp_path):
+    path = tmp_path / 'watermarks.json'
+    path.write_text('{"a": ')
+    assert LocalJSONStore(str(path)).load() is None
@@ -0,0 +1,70 @@
+import gzip
+import json
+
+from ziki_helpers.toast_api.landing_writer import PartitionedLandingWriter, MultipartUpload
+
+
+class FakeS3:
+    """Just enough of the S3 client to collect objects in memory."""
+
+    def __init__(self):
+        self.objects = dict()
+        self.object_args = dict()
+        self.uploads = dict()
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = bytes(Body)
+        self.object_args[Key] = kwargs
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        self.uploads[Key] = []
+        return {'UploadId': Key}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        self.uploads[Key].append(Body)
+        return {'ETag': str(PartNumber)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.objects[Key] = b''.join(self.uploads.pop(Key))
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(Key)
+
+
+def test_partitioned_landing_writer():
+    client = FakeS3()
+    records = [{'guid': str(i), 'location': i % 2} for i in range(10)]
+
+    with PartitionedLandingWriter('bucket', 'menu_items', '20230801000000', client=client) as writer:
+        writer.write_all(records, lambda record: (record['location'], '2023-08-01'))
+
+    key = 'menu_items/location=0/date=2023-08-01/20230801000000.ndjson.gz'
+    # Served as a .gz file, so clients don't decompress it on download
+    assert client.object_args[key] == {'ContentType': 'application/gzip'}
+    lines = gzip.decompress(client.objects[key]).decode('utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == records[::2]
+
+    manifest = json.loads(client.objects['menu_items/_manifests/20230801000000.json'])
+    assert manifest['records'] == 10
+    assert sorted(file['key'] for file in manifest['files']) == sorted([key, key.replace('location=0', 'location=1')])
+
+
+def test_multipart_upload():
+    client = FakeS3()
+    upload = MultipartUpload('bucket', 'big.ndjson', client, part_size=10)
+    for _ in range(5):
+        upload.write(b'0123456')
+    upload.close()
+    assert client.objects['big.ndjson'] == b'0123456' * 5
+    assert not client.uploads
+
+
+def test_abort_leaves_nothing():
+    client = FakeS3()
+    try:
+        with PartitionedLandingWriter('bucket', 'orders', 'run', client=client) as writer:
+            writer.write({'guid': 'a'}, 1, '2023-08-01')
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert not client.objects
@@ -0,0 +1,59 @@
+import random
+import datetime as dt
+
+import numpy as np
+import pytest
+
+from ziki_helpers.toast_api.location_index import LocationIndex
+
+
+def first_match(location_info, date):
+    """Linear scan over the info list, same as location_id_from_date."""
+    date = dt.datetime.strptime(str(date), '%Y%m%d').strftime('%Y-%m-%d')
+    for loc in location_info:
+        if loc['startDate'] is None or loc['startDate'] <= date:
+            if loc['endDate'] is None or loc['endDate'] >= date:
+                return loc['id']
+    return None
+
+
+def test_location_index_eras():
+    info = [
+        {'id': 1, 'startDate': None, 'endDate': '2022-06-30'},
+        {'id': 2, 'startDate': '2022-07-01', 'endDate': None},
+    ]
+    index = LocationIndex(info)
+    assert index.location_id(20220630) == 1
+    assert index.location_id('20220701') == 2
+    assert list(index.location_ids(np.array([20210101, 20220630, 20220701, 20300101]))) == [1, 1, 2, 2]
+
+
+def test_location_index_gap():
+    index = LocationIndex([
+        {'id': 1, 'startDate': '2022-01-01', 'endDate': '2022-01-31'},
+        {'id': 2, 'startDate': '2022-03-01', 'endDate': None},
+    ])
+    with pytest.raises(ValueError):
+        index.location_id(20220215)
+    with pytest.raises(ValueError):
+        index.location_ids([20220115, 20220215])
+
+
+def test_location_index_matches_linear_scan():
+    rng = random.Random(0)
+    base = dt.date(2022, 1, 1)
+
+    def random_date():
+        return (base + dt.timedelta(days=rng.randrange(365))).strftime('%Y-%m-%d') if rng.random() < 0.8 else None
+
+    for _ in range(50):
+        info = [{'id': i, 'startDate': random_date(), 'endDate': random_date()} for i in range(rng.randint(2, 5))]
+        index = LocationIndex(info)
+        dates = [int((base + dt.timedelta(days=days)).strftime('%Y%m%d')) for days in range(-10, 380)]
+        for date in dates:
+            expected = first_match(info, date)
+            if expected is None:
+                with pytest.raises(ValueError):
+                    index.location_id(date)
+            else:
+                assert index.location_id(date) == expected
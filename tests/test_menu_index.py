@@ -0,0 +1,49 @@
+from ziki_helpers.toast_api.menu_index import MenuIndex
+
+import pytest
+
+menu = {
+    'modifierOptionReferences': {
+        '1': {'guid': 'option-guac', 'referenceId': 1, 'name': 'Guacamole'},
+        '2': {'guid': 'option-queso', 'referenceId': 2, 'name': 'Queso'},
+    },
+    'modifierGroupReferences': {
+        '10': {'guid': 'group-sides', 'referenceId': 10, 'name': 'Sides', 'modifierOptionReferences': [1, 2]},
+        '11': {'guid': 'group-extras', 'referenceId': 11, 'name': 'Extras', 'modifierOptionReferences': [2]},
+    },
+    'menus': [
+        {
+            'menuGroups': [
+                {'menuItems': [
+                    {'name': 'Bowl', 'modifierGroupReferences': [10, 11]},
+                    {'name': 'Taco', 'modifierGroupReferences': [11]},
+                ]},
+                {'menuItems': [
+                    {'name': 'Burrito', 'modifierGroupReferences': [10]},
+                ]},
+            ]
+        }
+    ],
+}
+
+
+def test_is_modifier():
+    menu_index = MenuIndex(menu)
+
+    assert menu_index.is_modifier('option-guac')
+    assert not menu_index.is_modifier('item-bowl')
+
+
+def test_modifier_info():
+    menu_index = MenuIndex(menu)
+
+    assert menu_index.modifier_info('option-guac') == {
+        'modifier_name': 'Guacamole',
+        'modifier_group_name': 'Sides',
+        'menu_items': ['Bowl', 'Burrito'],
+    }
+    # First group offering the option wins
+    assert menu_index.modifier_info('option-queso')['modifier_group_name'] == 'Sides'
+
+    with pytest.raises(KeyError):
+        menu_index.modifier_info('item-bowl')
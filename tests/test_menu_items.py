@@ -0,0 +1,69 @@
+import random
+
+from ziki_helpers.toast_data.menu_items import menu_items_to_arrow
+
+
+def old_workup(data):
+    """
+    Rows of the old preprocess_menu_items without Spark: drop null guids, explode optionGroups, collect_list the
+    option group guids per item guid and left join them back on.
+    """
+    items = [item for item in data if item.get('guid') is not None]
+    option_group_guids = dict()
+    for item in items:
+        for option_group in item.get('optionGroups') or []:
+            # collect_list skips nulls
+            guids = option_group_guids.setdefault(item['guid'], [])
+            if option_group.get('guid') is not None:
+                guids.append(option_group['guid'])
+    return [
+        {
+            'guid': item['guid'],
+            'visibility': item.get('visibility'),
+            'orderableOnline': item.get('orderableOnline'),
+            'name': item.get('name'),
+            'optionGroupGuids': option_group_guids.get(item['guid']),
+        } for item in items
+    ]
+
+
+def test_menu_items_to_arrow():
+    data = [
+        {'guid': 'a', 'name': 'Taco', 'optionGroups': [{'guid': 'x', 'name': 'Salsa'}, {'guid': 'y'}], 'extra': 1},
+        {'guid': 'b', 'optionGroups': None},
+        {'guid': 'c', 'optionGroups': []},
+        {'guid': 'd'},
+        {'guid': 'e', 'optionGroups': [{'guid': None}, {'guid': 'z'}]},
+        {'guid': 'f', 'optionGroups': [{}]},
+    ]
+    table = menu_items_to_arrow(data)
+
+    assert table.column_names == ['guid', 'visibility', 'orderableOnline', 'name', 'optionGroupGuids']
+    assert table.column('optionGroupGuids').to_pylist() == [['x', 'y'], None, None, None, ['z'], []]
+    assert table.column('name').to_pylist() == ['Taco', None, None, None, None, None]
+    assert menu_items_to_arrow([]).num_rows == 0
+
+
+def test_menu_items_to_arrow_matches_old_workup():
+    rng = random.Random(0)
+
+    def option_groups():
+        return rng.choice([
+            None,
+            [],
+            [{'guid': rng.choice([f'group-{rng.randrange(20)}', None]), 'name': 'Group'} for _ in range(rng.randrange(1, 4))],
+        ])
+
+    data = [
+        {
+            'guid': f'item-{i}' if rng.random() < 0.9 else None,
+            'visibility': rng.choice(['ALL', 'POS_ONLY', None]),
+            'orderableOnline': rng.choice(['YES', 'NO', None]),
+            'name': f'Item {i}',
+            'optionGroups': option_groups(),
+        } for i in range(500)
+    ]
+    # Dropping null guids is left to Spark in preprocess_menu_items
+    rows = [row for row in menu_items_to_arrow(data).to_pylist() if row['guid'] is not None]
+
+    assert rows == old_workup(data)
@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from ziki_helpers.toast_api.pipeline import iter_in_background
+
+
+def test_iter_in_background_order():
+    assert list(iter_in_background(range(100), maxsize=3)) == list(range(100))
+
+
+def test_iter_in_background_overlaps():
+    next_started = threading.Event()
+
+    def pages():
+        yield 0
+        # Only reached while the consumer still holds page 0 if the producer runs ahead on its own thread
+        next_started.set()
+        yield 1
+
+    background = iter_in_background(pages())
+    assert next(background) == 0
+    assert next_started.wait(timeout=5)
+    assert list(background) == [1]
+
+
+def test_iter_in_background_error():
+    def failing():
+        yield 1
+        raise ValueError('boom')
+
+    pages = iter_in_background(failing())
+    assert next(pages) == 1
+    with pytest.raises(ValueError):
+        next(pages)
+
+
+def test_iter_in_background_stops_producer():
+    produced = []
+    producers = []
+
+    def endless():
+        producers.append(threading.current_thread())
+        i = 0
+        while True:
+            produced.append(i)
+            yield i
+            i += 1
+
+    pages = iter_in_background(endless(), maxsize=2)
+    assert next(pages) == 0
+    pages.close()
+    [producer] = producers
+    producer.join(timeout=5)
+    assert not producer.is_alive()
+    # The consumed page, two queued and one blocked waiting for room
+    assert len(produced) <= 4
@@ -0,0 +1,43 @@
+import datetime as dt
+
+from ziki_helpers.toast_api.watermarks import LocalWatermarkStore, DEFAULT_OVERLAP, MIN_OVERLAP, OVERLAP_DECAY
+
+UTC = dt.timezone.utc
+
+
+def test_watermark_start_and_advance(tmp_path):
+    path = str(tmp_path / 'orders.json')
+    default = dt.datetime(2023, 8, 1, tzinfo=UTC)
+    end = dt.datetime(2023, 8, 2, tzinfo=UTC)
+
+    store = LocalWatermarkStore(path, end).load()
+    assert store.start('a', default) == default
+    store.advance('a')
+
+    store = LocalWatermarkStore(path, end + dt.timedelta(hours=1)).load()
+    assert store.start('a', default) == end - DEFAULT_OVERLAP
+    assert store.start('b', default) == default
+
+
+def test_adaptive_overlap(tmp_path):
+    path = str(tmp_path / 'orders.json')
+    first_end = dt.datetime(2023, 8, 2, 12, tzinfo=UTC)
+    LocalWatermarkStore(path, first_end).load().advance('a')
+
+    # Nothing late, overlap shrinks
+    store = LocalWatermarkStore(path, first_end + dt.timedelta(hours=1), adaptive=True).load()
+    store.observe('a', {'modifiedDate': '2023-08-02T12:30:00.000+0000'})
+    store.advance('a')
+    assert store.overlap('a') == DEFAULT_OVERLAP * OVERLAP_DECAY
+
+    # A record modified 3 hours before the watermark only showed up now, overlap grows past it
+    store = LocalWatermarkStore(path, first_end + dt.timedelta(hours=2), adaptive=True).load()
+    store.observe('a', {'modifiedDate': '2023-08-02T10:00:00.000+0000'})
+    store.advance('a')
+    assert store.overlap('a') == dt.timedelta(hours=6)
+
+    # Decays but never below the minimum
+    for hours in range(3, 30):
+        store = LocalWatermarkStore(path, first_end + dt.timedelta(hours=hours), adaptive=True).load()
+        store.advance('a')
+    assert store.overlap('a') == MIN_OVERLAP
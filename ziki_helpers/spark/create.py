@@ -22,6 +22,8 @@ def get_spark_for_delta_s3(aws_region='us-east-1'):
         .config("spark.jars.packages", spark_jars_packages)
         .config("spark.sql.sources.partitionOverwriteMode", "dynamic")
         .config("spark.databricks.delta.schema.autoMerge.enabled", "true")
+        # pandas <-> Spark conversions through Arrow, ie: preprocess_menu_items
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true")
         .config("spark.hadoop.fs.s3a.endpoint", f"s3.{aws_region}.amazonaws.com")
         #.config("spark.hadoop.fs.s3a.aws.credentials.provider", "org.apache.hadoop.fs.s3a.SimpleAWSCredentialsProvider")
         .config("spark.hadoop.fs.s3a.aws.credentials.provider", "com.amazonaws.auth.DefaultAWSCredentialsProviderChain")
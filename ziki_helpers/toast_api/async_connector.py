@@ -0,0 +1,107 @@
+"""
+Fan Toast getters out across locations.
+
+The connector's I/O is blocking (requests), so nothing here does asyncio I/O: every call runs on a thread pool.
+AsyncToastConnector wraps that pool in coroutines for callers already inside an event loop, fetch_for_locations is the
+same fan out straight on the pool for synchronous code.
+"""
+import asyncio
+import datetime as dt
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Union
+
+from ziki_helpers.toast_api.connector import ToastConnector, DEFAULT_MAX_WORKERS
+
+# Max number of connector calls (ie: locations) running at once. A call can make several requests at a time of its
+# own (order prefetch, labor windows, ID chunks), the total in flight is capped by ToastHTTPClient.max_in_flight.
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+class AsyncToastConnector:
+    """
+    Coroutine front end for ToastConnector, backed by a thread pool.
+
+    Exposes the same getters as ToastConnector as coroutines. Each call runs the blocking connector method on a
+    bounded thread pool through run_in_executor, so awaiting many of them queries many locations at once. The
+    concurrency comes from the threads, not from asyncio I/O.
+    """
+
+    def __init__(self, connector: Union[ToastConnector, None] = None, max_concurrency: int = DEFAULT_MAX_CONCURRENCY):
+        self.connector = connector if connector is not None else ToastConnector()
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='toast')
+
+    async def _run(self, method_name: str, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        method = getattr(self.connector, method_name)
+        return await loop.run_in_executor(self.executor, lambda: method(*args, **kwargs))
+
+    async def get_orders_by_business_date(self, business_date: int, location_guid: Union[str, None] = None, prefetch: int = 0) -> list[dict[str, Any]]:
+        return await self._run('get_orders_by_business_date', business_date, location_guid, prefetch)
+
+    async def get_labor_by_business_date(self, business_date: int, location_guid: Union[str, None] = None) -> list[dict[str, Any]]:
+        return await self._run('get_labor_by_business_date', business_date, location_guid)
+
+    async def get_orders_between_times(self, start: dt.datetime, end: dt.datetime, location_guid: Union[str, None] = None, prefetch: int = 0) -> list[dict[str, Any]]:
+        return await self._run('get_orders_between_times', start, end, location_guid, prefetch)
+
+    async def get_labor_between_times(self, start: dt.datetime, end: dt.datetime, location_guid: Union[str, None] = None,
+                                      max_workers: int = DEFAULT_MAX_WORKERS) -> list[dict[str, Any]]:
+        return await self._run('get_labor_between_times', start, end, location_guid, max_workers)
+
+    async def get_config_mappings(self, config: str, location_guid: Union[str, None] = None, start_time: Union[str, dt.datetime, None] = None) -> list[dict[str, Any]]:
+        return await self._run('get_config_mappings', config, location_guid, start_time)
+
+    async def get_labor_mappings(self, labor_config, location_guid: Union[str, None] = None, ids: Union[list[str], None] = None,
+                                 max_workers: int = DEFAULT_MAX_WORKERS) -> list[dict[str, Any]]:
+        return await self._run('get_labor_mappings', labor_config, location_guid, ids, max_workers)
+
+    async def get_menu_items_by_after_datetime(self, starting_datetime: dt.datetime, location_guid: Union[str, None] = None) -> list[dict[str, Any]]:
+        return await self._run('get_menu_items_by_after_datetime', starting_datetime, location_guid)
+
+    async def get_item_name_from_guid(self, item_guid: str, location_guid: Union[str, None] = None) -> str:
+        return await self._run('get_item_name_from_guid', item_guid, location_guid)
+
+    async def get_item_names_from_guids(self, item_guids: list[str], location_guid: Union[str, None] = None,
+                                        max_workers: int = DEFAULT_MAX_WORKERS) -> dict[str, str]:
+        return await self._run('get_item_names_from_guids', item_guids, location_guid, max_workers)
+
+    async def get_out_of_stock_guids(self, location_guid: Union[str, None] = None) -> list[str]:
+        return await self._run('get_out_of_stock_guids', location_guid)
+
+    async def get_menu(self, location_guid: Union[str, None] = None) -> list[dict[str, Any]]:
+        return await self._run('get_menu', location_guid)
+
+    async def get_restaurant_info(self, location_guid: Union[str, None] = None) -> dict:
+        return await self._run('get_restaurant_info', location_guid)
+
+    async def for_locations(self, method_name: str, location_guids: list[str], *args, **kwargs) -> dict[str, Any]:
+        """
+        Run one getter for every location concurrently.
+        :param method_name: name of the getter, ie: 'get_orders_between_times'
+        :param location_guids: locations to query
+        :param args: positional args for the getter, excluding location_guid
+        :param kwargs: keyword args for the getter
+        :return: dict of location guid -> getter result
+        """
+        method = getattr(self, method_name)
+        results = await asyncio.gather(
+            *[method(*args, location_guid=location_guid, **kwargs) for location_guid in location_guids]
+        )
+        return dict(zip(location_guids, results))
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+def fetch_for_locations(connector: ToastConnector, method_name: str, location_guids: list[str], *args,
+                        max_concurrency: int = DEFAULT_MAX_CONCURRENCY, **kwargs) -> dict[str, Any]:
+    """
+    Blocking, thread pool fan out of a getter across locations, for synchronous code.
+    No event loop is involved, so it also works when called from inside a running one.
+    :return: dict of location guid -> getter result
+    """
+    method = getattr(connector, method_name)
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='toast') as executor:
+        results = executor.map(lambda location_guid: method(*args, location_guid=location_guid, **kwargs), location_guids)
+        return dict(zip(location_guids, results))
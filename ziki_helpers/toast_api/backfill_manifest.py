@@ -0,0 +1,61 @@
+import threading
+import datetime as dt
+from typing import Union
+
+from ziki_helpers.toast_api.json_store import JSONStore, LocalJSONStore, S3JSONStore
+
+
+def unit_key(business_date: Union[str, int], location_guid: str) -> str:
+    return f'{business_date}/{location_guid}'
+
+
+class BackfillManifest:
+    """
+    Progress of a date range backfill, the (business date, location) units that have finished.
+
+    Each unit is recorded as soon as it's written, so a rerun after a failure can skip straight to the units that
+    didn't finish. Delete the manifest once the whole range is done, so a later rerun of the same range starts over.
+    """
+
+    def __init__(self, store: JSONStore):
+        self.store = store
+        self.done = dict()  # unit key -> item count
+        self.lock = threading.Lock()
+
+    def load(self) -> 'BackfillManifest':
+        manifest = self.store.load()
+        self.done = manifest['done'] if manifest is not None else dict()
+        if self.done:
+            print(f'Resuming backfill, {len(self.done)} units already done')
+        return self
+
+    def is_done(self, business_date: Union[str, int], location_guid: str) -> bool:
+        with self.lock:
+            return unit_key(business_date, location_guid) in self.done
+
+    def mark_done(self, business_date: Union[str, int], location_guid: str, count: int) -> None:
+        """Record a finished unit and persist the manifest."""
+        with self.lock:
+            self.done[unit_key(business_date, location_guid)] = count
+            # Saved under the lock so an older snapshot never overwrites a newer one
+            self.store.save({
+                'updatedAt': dt.datetime.now(dt.timezone.utc).isoformat(timespec='milliseconds'),
+                'done': self.done,
+            })
+
+    def delete(self) -> None:
+        self.store.delete()
+
+
+class LocalBackfillManifest(BackfillManifest):
+    """Backfill manifest in a JSON file on local disk."""
+
+    def __init__(self, path: str):
+        super().__init__(LocalJSONStore(path))
+
+
+class S3BackfillManifest(BackfillManifest):
+    """Backfill manifest in S3, so a backfill can be resumed from a different machine."""
+
+    def __init__(self, bucket_name: str, key: str):
+        super().__init__(S3JSONStore(bucket_name, key))
@@ -5,22 +5,25 @@ import pytz
 import json
 import requests
 from decimal import Decimal
-from typing import Any, Union
+from typing import Any, Iterable, Iterator, Union
 import re
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from zoneinfo import ZoneInfo
 
 # Common 3rd Party
-import pandas as pd
 import boto3
 
 # My 3rd Party
 from toast_auth import ToastToken
 
 # My Libraries
-import ziki_helpers.config.settings
-from ziki_helpers.aws.s3 import read_from_s3, write_to_s3
-from ziki_helpers.aws.dynamodb import get_entire_table
+from ziki_helpers.toast_api.http_client import ToastHTTPClient, get_default_client
+from ziki_helpers.toast_api.metrics import ConnectorMetrics
+from ziki_helpers.toast_api.menu_index import MenuIndex
+from ziki_helpers.toast_api.menu_cache import PersistentMenuCache, LocalMenuCache
+from ziki_helpers.toast_api.dedup import dedupe_by_guid
 
 
 def is_iso_datetime(input_string):
@@ -52,20 +55,78 @@ def snake_case_to_camel_case(snake_str: str) -> str:
     return camel_case
 
 
+def iter_records(pages: Iterable[list[dict[str, Any]]]) -> Iterator[dict[str, Any]]:
+    """Flatten an iterator of pages into an iterator of single records."""
+    for page in pages:
+        yield from page
+
+
+def get_labor_windows(start: dt.datetime, end: dt.datetime) -> list[tuple[dt.datetime, dt.datetime]]:
+    """
+    Split a time range into the 30 day windows timeEntries allows per query.
+    Because this query doesn't have pagination, we need to break it up into 30 day chunks.
+    """
+    windows = []
+    # Initialize the time window
+    time_window_start = start
+    time_window_end = time_window_start
+
+    while time_window_end < end:
+        # Move the ending time window up by 30 days (the max allowed by toast)
+        time_window_end = time_window_start + LABOR_WINDOW
+        windows.append((time_window_start, time_window_end))
+        # Move the start time window to the end
+        time_window_start += LABOR_WINDOW
+    return windows
+
+
+# Toast API endpoints, relative to the API server (TOAST_API_SERVER)
+orders_path = '/orders/v2/ordersBulk'
+labor_path = '/labor/v1/timeEntries'
+config_path = '/config/v2'
+dining_option_path = '/config/v2/diningOptions'
+labor_base_path = '/labor/v1'
+alternate_payments_path = '/config/v2/alternatePaymentTypes'
+menu_path = '/menus/v2/menus'
+menu_items_path = '/config/v2/menuItems'
+inventory_path = '/stock/v1/inventory'
+last_updated_path = '/menus/v2/metadata'
+restaurant_path = '/restaurants/v1/restaurants'
+
+# Full URLs on the server set at import time, kept for callers of the old module constants.
+# ToastConnector builds its URLs from api_server instead, see ToastConnector.url
 TOAST_API_SERVER = os.environ.get('TOAST_API_SERVER')
+orders_url = f'{TOAST_API_SERVER}{orders_path}'
+labor_url = f'{TOAST_API_SERVER}{labor_path}'
+config_url = f'{TOAST_API_SERVER}{config_path}'
+dining_option_url = f'{TOAST_API_SERVER}{dining_option_path}'
+labor_base_url = f'{TOAST_API_SERVER}{labor_base_path}'
+alternate_payments_url = f'{TOAST_API_SERVER}{alternate_payments_path}'
+menu_url = f'{TOAST_API_SERVER}{menu_path}'
+menu_items_url = f'{TOAST_API_SERVER}{menu_items_path}'
+inventory_url = f'{TOAST_API_SERVER}{inventory_path}'
+last_updated_url = f'{TOAST_API_SERVER}{last_updated_path}'
+restaurant_url = f'{TOAST_API_SERVER}{restaurant_path}'
 
-# Toast API endpoints
-orders_url = f'{TOAST_API_SERVER}/orders/v2/ordersBulk'
-labor_url = f'{TOAST_API_SERVER}/labor/v1/timeEntries'
-config_url = f"{TOAST_API_SERVER}/config/v2"
-dining_option_url = f'{TOAST_API_SERVER}/config/v2/diningOptions'
-labor_base_url = f"{TOAST_API_SERVER}/labor/v1"
-alternate_payments_url = f"{TOAST_API_SERVER}/config/v2/alternatePaymentTypes"
-menu_url = f"{TOAST_API_SERVER}/menus/v2/menus"
-menu_items_url = f"{TOAST_API_SERVER}/config/v2/menuItems"
-inventory_url = f"{TOAST_API_SERVER}/stock/v1/inventory"
-last_updated_url = f"{TOAST_API_SERVER}/menus/v2/metadata"
-restaurant_url = f"{TOAST_API_SERVER}/restaurants/v1/restaurants"
+# In process menus are trusted this long before checking the menus metadata endpoint again
+MENU_REVALIDATE_SECONDS = 15 * 60
+
+# Item name dictionary settings
+ITEM_NAMES_EPOCH = dt.datetime(2015, 12, 1)  # Earliest date
+ITEM_NAMES_SYNC_OVERLAP = dt.timedelta(minutes=5)
+ITEM_NAMES_REFRESH_SECONDS = 5 * 60
+
+# Max time range allowed by a single timeEntries query
+LABOR_WINDOW = dt.timedelta(days=30)
+
+# Default number of concurrent requests when a single call is split up
+DEFAULT_MAX_WORKERS = 4
+
+# Max number of IDs per employees / jobs query
+LABOR_MAPPING_MAX_IDS = 100
+
+# Max page size allowed by ordersBulk
+ORDERS_PAGE_SIZE = 100
 
 
 # Stores the last time orders were written to DynamoDB
@@ -85,35 +146,116 @@ os.environ['FILE_NAME'] = 'toast_token.json'
 
 class ToastConnector:
 
-    def __init__(self):
-        self.toast_token = ToastToken('s3')
+    def __init__(self, http_client: Union[ToastHTTPClient, None] = None, persistent_menu_cache: Union[PersistentMenuCache, None, bool] = True,
+                 toast_token: Union[dict[str, str], None] = None, api_server: Union[str, None] = None,
+                 metrics_path: Union[str, None] = None, decimal_floats: bool = False):
+        if toast_token is None:
+            # Loads the Toast API secrets into the environment, only needed when talking to the real API
+            import ziki_helpers.config.settings
+            toast_token = ToastToken('s3')
+        self.toast_token = toast_token
+        self.api_server = api_server if api_server is not None else os.environ.get('TOAST_API_SERVER')
+        # Shared keep-alive session, handles rate limiting and retries
+        self.http = http_client if http_client is not None else get_default_client()
+        # Where write_metrics puts the run summary, local path or s3:// URI
+        self.metrics_path = metrics_path if metrics_path is not None else os.environ.get('TOAST_METRICS_PATH')
+        # Decode order, labor and mapping floats straight to Decimal, so records can go to DynamoDB as they are
+        self.decimal_floats = decimal_floats
         self.location_guid = None
         self.menu_cache = dict()
+        self.menu_last_updated = dict()
+        self.menu_checked_at = dict()
+        # Menus persisted between runs, validated against the menus metadata endpoint
+        # True -> default local disk cache, False/None -> disabled
+        if persistent_menu_cache is True:
+            persistent_menu_cache = LocalMenuCache()
+        self.persistent_menu_cache = persistent_menu_cache or None
+        self.menu_index_cache = dict()
+        # Local item guid -> name dictionary per location, kept fresh incrementally
+        self.item_names = dict()
+        self.item_names_synced_at = dict()
+
+    def decode(self, response: requests.Response) -> Any:
+        """Parse a response body, with floats as Decimal when decimal_floats is set."""
+        if self.decimal_floats:
+            return json.loads(response.content, parse_float=Decimal)
+        return response.json()
 
-    def get_orders_by_business_date(self, business_date: int, location_guid: Union[str, None] = None) -> list[dict[str, Any]]:
-        data = []
-        # Query the orders
-        page = 1
-        while True:
-            print("Page: ", page)
-            # Query the orders
-            query = {
-                "businessDate": business_date,
-                "page": str(page),
-                "pageSize": "100",
-            }
+    def iter_orders_by_business_date(self, business_date: int, location_guid: Union[str, None] = None, prefetch: int = 0) -> Iterator[list[dict[str, Any]]]:
+        """
+        Yield the orders for a business date one page (up to 100 orders) at a time.
+        :param prefetch: once a full page arrives, keep this many following pages in flight concurrently. 0 is sequential.
+        """
+        query = {
+            "businessDate": business_date,
+        }
+        yield from self._iter_orders_bulk(query, location_guid, prefetch)
 
-            response = requests.get(orders_url, headers=self.headers(location_guid), params=query)
-            assert response.status_code == 200, f"API call failed. Response.\n{response}"
-            response = response.json()
-            print('Query Size: ', len(response))
+    def iter_orders_between_times(self, start: dt.datetime, end: dt.datetime, location_guid: Union[str, None] = None, prefetch: int = 0) -> Iterator[list[dict[str, Any]]]:
+        """
+        Yield the orders between two times one page (up to 100 orders) at a time.
+        :param prefetch: once a full page arrives, keep this many following pages in flight concurrently. 0 is sequential.
+        """
+        query = {
+            "startDate": format_datetime_to_iso(start),
+            "endDate": format_datetime_to_iso(end),
+        }
+        yield from self._iter_orders_bulk(query, location_guid, prefetch)
 
-            data += response
+    def _get_orders_page(self, query: dict[str, Any], page: int, location_guid: Union[str, None] = None) -> list[dict[str, Any]]:
+        # Query the orders
+        page_query = {
+            **query,
+            "page": str(page),
+            "pageSize": str(ORDERS_PAGE_SIZE),
+        }
 
-            if len(response) < 100:
-                break
-            else:
-                page += 1
+        response = self.http.get(self.url(orders_path), headers=self.headers(location_guid), params=page_query)
+        response = self.decode(response)
+        return response
+
+    def _iter_orders_bulk(self, query: dict[str, Any], location_guid: Union[str, None] = None, prefetch: int = 0) -> Iterator[list[dict[str, Any]]]:
+        if location_guid is None:
+            location_guid = self.location_guid
+
+        if prefetch <= 0:
+            page = 1
+            while True:
+                response = self._get_orders_page(query, page, location_guid)
+                yield response
+
+                if len(response) < ORDERS_PAGE_SIZE:
+                    break
+                else:
+                    page += 1
+            return
+
+        # Speculative paging. Quiet days cost one request, once a full page comes back the next pages are requested
+        # concurrently. Pages are yielded in order, anything past the first short page is cancelled or ignored.
+        in_flight = 1
+        next_page = 1
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=prefetch) as executor:
+            try:
+                while True:
+                    while len(pending) < in_flight:
+                        pending.append(executor.submit(self._get_orders_page, query, next_page, location_guid))
+                        next_page += 1
+
+                    response = pending.popleft().result()
+                    yield response
+
+                    if len(response) < ORDERS_PAGE_SIZE:
+                        break
+                    in_flight = prefetch
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def get_orders_by_business_date(self, business_date: int, location_guid: Union[str, None] = None, prefetch: int = 0) -> list[dict[str, Any]]:
+        data = []
+        for page in self.iter_orders_by_business_date(business_date, location_guid, prefetch):
+            data += page
         return data
 
     def get_labor_by_business_date(self, business_date: int, location_guid: Union[str, None] = None) -> list[dict[str, Any]]:
@@ -122,60 +264,60 @@ class ToastConnector:
             "businessDate": business_date,
         }
 
-        response = requests.get(labor_url, headers=self.headers(location_guid), params=query)
-        assert response.status_code == 200, f"API call failed. Response.\n{response}"
+        response = self.http.get(self.url(labor_path), headers=self.headers(location_guid), params=query)
 
-        return response.json()
+        return self.decode(response)
 
-    def get_orders_between_times(self, start: dt.datetime, end: dt.datetime, location_guid: Union[str, None] = None) -> list[dict[str, Any]]:
+    def get_orders_between_times(self, start: dt.datetime, end: dt.datetime, location_guid: Union[str, None] = None, prefetch: int = 0) -> list[dict[str, Any]]:
         data = []
-        page = 1
-        while True:
-            print("Page: ", page)
-            # Query the orders
-            query = {
-                "startDate": format_datetime_to_iso(start),
-                "endDate": format_datetime_to_iso(end),
-                "page": str(page),
-                "pageSize": "100",
-            }
-
-            response = requests.get(orders_url, headers=self.headers(location_guid), params=query)
-            assert response.status_code == 200, f"API call failed. Response.\n{response}"
-            response = response.json()
-
-            data += response
-            if len(response) < 100:
-                break
-            else:
-                page += 1
+        for page in self.iter_orders_between_times(start, end, location_guid, prefetch):
+            data += page
         return data
 
-    def get_labor_between_times(self, start: dt.datetime, end: dt.datetime, location_guid: Union[str, None] = None) -> list[dict[str, Any]]:
-        data = []
-        # Because this query doesn't have pagination, we need to break it up into 30 day chunks
-        # Initialize the time window
-        time_window_start = start
-        time_window_end = time_window_start
-
-        while time_window_end < end:
-            # Move the ending time window up by 30 days (the max allowed by toast)
-            time_window_end = time_window_start + dt.timedelta(days=30)
-            # Query time entries
-            query = {
-                "modifiedStartDate": format_datetime_to_iso(time_window_start),
-                "modifiedEndDate": format_datetime_to_iso(time_window_end),
-            }
+    def iter_labor_between_times(self, start: dt.datetime, end: dt.datetime, location_guid: Union[str, None] = None) -> Iterator[list[dict[str, Any]]]:
+        """
+        Yield the time entries modified between two times one 30 day window at a time.
+        Entries on a window edge come back in both windows. Like get_labor_between_times the most recently modified
+        copy wins: a later copy is only yielded again when its modifiedDate is newer, so writing the pages in order
+        leaves the same records get_labor_between_times returns.
+        """
+        yielded = dict()  # guid -> modifiedDate of the copy yielded
+        for window_start, window_end in get_labor_windows(start, end):
+            page = [
+                entry for entry in dedupe_by_guid(self._get_labor_window(window_start, window_end, location_guid))
+                if entry.get('guid') is None or entry['guid'] not in yielded
+                or (entry.get('modifiedDate') or '') > yielded[entry['guid']]
+            ]
+            yielded.update((entry['guid'], entry.get('modifiedDate') or '') for entry in page if entry.get('guid') is not None)
+            yield page
+
+    def _get_labor_window(self, window_start: dt.datetime, window_end: dt.datetime, location_guid: Union[str, None] = None) -> list[dict[str, Any]]:
+        # Query time entries
+        query = {
+            "modifiedStartDate": format_datetime_to_iso(window_start),
+            "modifiedEndDate": format_datetime_to_iso(window_end),
+        }
+        response = self.http.get(self.url(labor_path), headers=self.headers(location_guid), params=query)
+        return self.decode(response)
 
-            response = requests.get(labor_url, headers=self.headers(location_guid), params=query)
-            assert response.status_code == 200, f"API call failed. Response.\n{response}"
+    def get_labor_between_times(self, start: dt.datetime, end: dt.datetime, location_guid: Union[str, None] = None,
+                                max_workers: int = DEFAULT_MAX_WORKERS) -> list[dict[str, Any]]:
+        """
+        Get the time entries modified between two times.
+        The 30 day windows are fetched concurrently, then merged and deduplicated by guid since the window edges overlap.
+        """
+        if location_guid is None:
+            location_guid = self.location_guid
 
-            data += response.json()
+        windows = get_labor_windows(start, end)
+        if not windows:
+            return []
 
-            # Move the start time window to the end
-            time_window_start += dt.timedelta(days=30)
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(windows))) as executor:
+            results = executor.map(lambda window: self._get_labor_window(*window, location_guid), windows)
+            data = [entry for window_data in results for entry in window_data]
 
-        return data
+        return dedupe_by_guid(data)
 
     # def get_dining_options(self, location_guid: Union[str, None] = None, start_time: Union[str, dt.datetime, None] = None) -> list[dict[str, Any]]:
     #
@@ -224,64 +366,128 @@ class ToastConnector:
         if is_snake_case(config):
             config = snake_case_to_camel_case(config)
         if config == 'alternatePayments':
-            url = config_url + '/' + 'alternatePaymentTypes'  # Toast makes it impossible to maintain consistency
+            url = self.url(config_path) + '/' + 'alternatePaymentTypes'  # Toast makes it impossible to maintain consistency
         else:
-            url = config_url + '/' + config
+            url = self.url(config_path) + '/' + config
 
-        response = requests.get(url, headers=self.headers(location_guid), params=query)
-        assert response.status_code == 200, f"API call failed. Response.\n{response}"
-        data = response.json()
+        response = self.http.get(url, headers=self.headers(location_guid), params=query)
+        data = self.decode(response)
         return data
 
-    def get_labor_mappings(self, labor_config, location_guid: Union[str, None] = None, ids: Union[list[str], None] = None) -> list[dict[str, Any]]:
-
+    def get_labor_mappings(self, labor_config, location_guid: Union[str, None] = None, ids: Union[list[str], None] = None,
+                           max_workers: int = DEFAULT_MAX_WORKERS) -> list[dict[str, Any]]:
+        """
+        Get employees or jobs, optionally filtered to a list of IDs.
+        Any number of IDs can be passed. They're queried concurrently in chunks of 100 (the max allowed by toast),
+        then merged and deduplicated by guid.
+        """
         assert labor_config.islower(), "Labor config must be lowercase."
-        if ids is not None:
-            assert len(ids) <= 100, "Maximum of 100 IDs can be queried at once."
+        if location_guid is None:
+            location_guid = self.location_guid
+
+        url = self.url(labor_base_path) + '/' + labor_config
+
+        if ids is None:
+            response = self.http.get(url, headers=self.headers(location_guid), params={})
+            return self.decode(response)
+
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return []
+        chunks = [ids[i:i + LABOR_MAPPING_MAX_IDS] for i in range(0, len(ids), LABOR_MAPPING_MAX_IDS)]
+
+        def get_chunk(chunk: list[str]) -> list[dict[str, Any]]:
             query = {
                 labor_config[:-1] + "Ids":  # Remove the 's' from the end of the config name (ie: employees -> employeeIds)
-                    ",".join(ids),
+                    ",".join(chunk),
             }
-        else:
-            query = {}
+            response = self.http.get(url, headers=self.headers(location_guid), params=query)
+            return self.decode(response)
 
-        url = labor_base_url + '/' + labor_config
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            data = [mapping for chunk_data in executor.map(get_chunk, chunks) for mapping in chunk_data]
 
-        response = requests.get(url, headers=self.headers(location_guid), params=query)
-        assert response.status_code == 200, f"API call failed. Response.\n{response}"
-        data = response.json()
-        return data
+        return dedupe_by_guid(data)
 
-    def get_menu_items_by_after_datetime(self, starting_datetime: dt.datetime, location_guid: Union[str, None] = None) -> list[dict[str, Any]]:
+    def iter_menu_items_by_after_datetime(self, starting_datetime: dt.datetime, location_guid: Union[str, None] = None) -> Iterator[list[dict[str, Any]]]:
+        """Yield the menu items modified after a time one page at a time."""
         query = {
             "lastModified": format_datetime_to_iso(starting_datetime)
         }
-        response = requests.get(menu_items_url, headers=self.headers(location_guid), params=query)
-        assert response.ok, f"API call failed. Response.\n{response}"
+        response = self.http.get(self.url(menu_items_path), headers=self.headers(location_guid), params=query)
+        yield response.json()
 
-        data = response.json()
         next_page_token = response.headers.get('Toast-Next-Page-Token')
         while next_page_token is not None:
             query['pageToken'] = next_page_token
-            response = requests.get(menu_items_url, headers=self.headers(location_guid), params=query)
-            data += response.json()
+            response = self.http.get(self.url(menu_items_path), headers=self.headers(location_guid), params=query)
+            yield response.json()
             next_page_token = response.headers.get('Toast-Next-Page-Token')
+
+    def get_menu_items_by_after_datetime(self, starting_datetime: dt.datetime, location_guid: Union[str, None] = None) -> list[dict[str, Any]]:
+        data = []
+        for page in self.iter_menu_items_by_after_datetime(starting_datetime, location_guid):
+            data += page
         return data
 
     def get_item_name_from_guid(self, item_guid: str, location_guid: Union[str, None] = None) -> str:
         # Get the menu item name from the item guid
-        url = menu_items_url + '/' + item_guid
-        response = requests.get(url, headers=self.headers(location_guid))
-        assert response.status_code == 200, f"API call failed. Response.\n{response}"
+        url = self.url(menu_items_path) + '/' + item_guid
+        response = self.http.get(url, headers=self.headers(location_guid))
         data = response.json()
         return data['name']
 
+    def sync_item_names(self, location_guid: Union[str, None] = None, force: bool = False) -> dict[str, str]:
+        """
+        Bring the local item guid -> name dictionary up to date.
+        The first sync pulls every menu item; after that only items modified since the last sync are pulled.
+        """
+        if location_guid is not None:
+            self.location_guid = location_guid
+        else:
+            location_guid = self.location_guid
+
+        names = self.item_names.setdefault(location_guid, dict())
+        last_sync = self.item_names_synced_at.get(location_guid)
+        if last_sync is not None and not force and time.monotonic() - last_sync[1] < ITEM_NAMES_REFRESH_SECONDS:
+            return names
+
+        now = dt.datetime.now(dt.timezone.utc)
+        # Overlap the last sync a little, in case of clock differences with Toast
+        since = ITEM_NAMES_EPOCH if last_sync is None else last_sync[0] - ITEM_NAMES_SYNC_OVERLAP
+        for page in self.iter_menu_items_by_after_datetime(since, location_guid):
+            for item in page:
+                if item.get('guid') is not None:
+                    names[item['guid']] = item['name']
+
+        self.item_names_synced_at[location_guid] = (now, time.monotonic())
+        return names
+
+    def get_item_names_from_guids(self, item_guids: list[str], location_guid: Union[str, None] = None,
+                                  max_workers: int = DEFAULT_MAX_WORKERS) -> dict[str, str]:
+        """
+        Resolve many menu item guids to names from the local item dictionary.
+        Guids missing from the dictionary are fetched one by one, concurrently.
+        :return: dict of item guid -> name
+        """
+        if location_guid is None:
+            location_guid = self.location_guid
+
+        names = self.sync_item_names(location_guid)
+
+        misses = [item_guid for item_guid in dict.fromkeys(item_guids) if item_guid not in names]
+        if misses:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(misses))) as executor:
+                fetched = executor.map(lambda item_guid: self.get_item_name_from_guid(item_guid, location_guid), misses)
+                names.update(zip(misses, fetched))
+
+        return {item_guid: names[item_guid] for item_guid in item_guids}
+
     def get_out_of_stock_guids(self, location_guid: Union[str, None] = None) -> list[str]:
         query = {"status": "OUT_OF_STOCK"}
 
         # Get the out of stock item guids
-        response = requests.get(inventory_url, headers=self.headers(location_guid), params=query)
-        assert response.status_code == 200, f"API call failed. Response.\n{response}"
+        response = self.http.get(self.url(inventory_path), headers=self.headers(location_guid), params=query)
         data = response.json()
         return list(set([item['guid'] for item in data]))
 
@@ -289,89 +495,115 @@ class ToastConnector:
         # Adjust location guid
         if location_guid is not None:
             self.location_guid = location_guid
+        else:
+            location_guid = self.location_guid
 
-        # Get menu from cache if it exists
-        if self.location_guid in self.menu_cache:
+        # Get menu from cache if it was checked recently
+        checked_at = self.menu_checked_at.get(location_guid)
+        if location_guid in self.menu_cache and checked_at is not None and time.monotonic() - checked_at < MENU_REVALIDATE_SECONDS:
             return self.menu_cache[location_guid]
 
-        # Rest 5 seconds to avoid rate limiting
-        time.sleep(5)
+        # Check when the menu last changed, a much cheaper call than the menu itself
+        metadata = self.http.get(self.url(last_updated_path), headers=self.headers(location_guid)).json()
+        last_updated = metadata.get('lastUpdated')
+        self.menu_checked_at[location_guid] = time.monotonic()
+
+        menu = None
+        if last_updated is not None:
+            if location_guid in self.menu_cache and self.menu_last_updated.get(location_guid) == last_updated:
+                return self.menu_cache[location_guid]
+            if self.persistent_menu_cache is not None:
+                menu = self.persistent_menu_cache.get(location_guid, last_updated)
+
+        if menu is None:
+            # Query menu API
+            response = self.http.get(self.url(menu_path), headers=self.headers(location_guid))
+            menu = response.json()
 
-        # Query menu API
-        response = requests.get(menu_url, headers=self.headers(location_guid))
-        assert response.status_code == 200, f"API call failed. Response.\n{response}"
-        menu = response.json()
+            if self.persistent_menu_cache is not None and last_updated is not None:
+                self.persistent_menu_cache.put(location_guid, last_updated, menu)
 
         # Add to menu cache
         self.menu_cache[location_guid] = menu
+        self.menu_last_updated[location_guid] = last_updated
 
         return menu
 
-    def item_guid_is_modifier(self, item_guid: str, location_guid: Union[str, None] = None) -> bool:
+    def get_menu_index(self, location_guid: Union[str, None] = None) -> MenuIndex:
+        """Returns the lookup index for a location's menu, rebuilt only when a new menu is fetched."""
         if location_guid is not None:
             self.location_guid = location_guid
+        else:
+            location_guid = self.location_guid
 
-        # Get menu as DataFrame
-        menu_df = pd.DataFrame([self.get_menu()])
+        menu = self.get_menu(location_guid)
+        menu_index = self.menu_index_cache.get(location_guid)
+        if menu_index is None or menu_index.menu is not menu:
+            menu_index = MenuIndex(menu)
+            self.menu_index_cache[location_guid] = menu_index
+        return menu_index
 
-        # Check if item guid is in modifier options
-        mod_options = menu_df['modifierOptionReferences'].apply(pd.Series).stack().apply(pd.Series)
-        mod_option_guids = mod_options['guid']
-        return item_guid in mod_option_guids.values
+    def item_guid_is_modifier(self, item_guid: str, location_guid: Union[str, None] = None) -> bool:
+        return self.get_menu_index(location_guid).is_modifier(item_guid)
 
     def get_modifier_info(self, item_guid: str, location_guid: Union[str, None] = None) -> dict:
         """
         Returns the modifier information for a given modifier GUID.
         :return:
         """
-        if location_guid is not None:
-            self.location_guid = location_guid
-
-        menu_df = pd.DataFrame([self.get_menu()])
-
-        mod_options = menu_df['modifierOptionReferences'].apply(pd.Series).stack().apply(pd.Series)
-        mod_groups = menu_df['modifierGroupReferences'].apply(pd.Series).stack().apply(pd.Series)
-
-        # Get modifier info
-        mod_info = mod_options.loc[mod_options['guid'] == item_guid]
-        mod_id = mod_info['referenceId'].values[0]
-        mod_name = mod_info['name'].values[0]
+        return self.get_menu_index(location_guid).modifier_info(item_guid)
 
-        # Get modifier group info
-        mod_group = mod_groups.loc[mod_groups['modifierOptionReferences'].apply(lambda x: mod_id in x)]
-        mod_group_name = mod_group['name'].values[0]
-        mod_group_id = mod_group['referenceId'].values[0]
-
-        # Get menu items w/ modifier group
-        menus = menu_df['menus'].apply(pd.Series).stack().apply(pd.Series)
-        menu_groups = menus['menuGroups'].apply(pd.Series).stack().apply(pd.Series)
-        menu_items = menu_groups['menuItems'].apply(pd.Series).stack().apply(pd.Series)
-        out_of_order_items = menu_items.loc[menu_items['modifierGroupReferences'].apply(lambda x: mod_group_id in x)]
-        menu_items = out_of_order_items['name'].tolist()
-
-        return {'modifier_name': mod_name, 'modifier_group_name': mod_group_name, 'menu_items': menu_items}
+    def get_out_of_stock_modifiers(self, location_guid: Union[str, None] = None) -> dict[str, dict]:
+        """
+        Returns the modifier information for every out of stock modifier at a location, in one pass over the menu index.
+        :return: dict of modifier guid -> modifier info
+        """
+        menu_index = self.get_menu_index(location_guid)
+        return {
+            item_guid: menu_index.modifier_info(item_guid)
+            for item_guid in self.get_out_of_stock_guids(location_guid)
+            if menu_index.is_modifier(item_guid)
+        }
 
     def get_restaurant_info(self, location_guid: Union[str, None] = None) -> dict:
         if location_guid is not None:
             self.location_guid = location_guid
+        else:
+            location_guid = self.location_guid
 
         # Get restaurant info
-        url = restaurant_url + '/' + self.location_guid
-        response = requests.get(url, headers=self.headers(location_guid))
-        assert response.status_code == 200, f"API call failed. Response.\n{response}"
+        url = self.url(restaurant_path) + '/' + location_guid
+        response = self.http.get(url, headers=self.headers(location_guid))
         data = response.json()
         return data
 
+    @property
+    def metrics(self) -> ConnectorMetrics:
+        """Request metrics, shared by every connector using the same HTTP client."""
+        return self.http.metrics
+
+    def write_metrics(self, path: Union[str, None] = None) -> None:
+        """Write a JSON summary of the request metrics to a local path or s3:// URI, if one is configured."""
+        path = path if path is not None else self.metrics_path
+        if path:
+            self.metrics.write_json(path)
+
+    def url(self, path: str) -> str:
+        return f'{self.api_server}{path}'
+
     def headers(self, location_guid: Union[str, None] = None) -> dict[str, str]:
         # Adjust location guid if specified
         if location_guid is not None:
             self.location_guid = location_guid
-        assert self.location_guid is not None, "Location GUID must be set before headers can be retrieved."
+        else:
+            location_guid = self.location_guid
+        assert location_guid is not None, "Location GUID must be set before headers can be retrieved."
 
         # Return structured headers
+        # Uses the local guid, so concurrent calls for other locations can't swap it out from under us
         return {
             **self.toast_token,
-            "Toast-Restaurant-External-ID": self.location_guid,
+            "Toast-Restaurant-External-ID": location_guid,
         }
 
 
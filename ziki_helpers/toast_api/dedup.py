@@ -0,0 +1,51 @@
+import json
+import hashlib
+from typing import Any, Iterable, Iterator
+
+
+def content_digest(record: dict[str, Any]) -> str:
+    """Stable hash of a record's content, independent of key order. Decimals and datetimes are hashed as strings."""
+    body = json.dumps(record, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.blake2b(body.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def dedupe_by_guid(records: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Keep one record per guid, preferring the most recently modified copy.
+    Order of first appearance is kept. Records without a guid are passed through.
+    """
+    unique = dict()
+    no_guid = []
+    for record in records:
+        guid = record.get('guid')
+        if guid is None:
+            no_guid.append(record)
+            continue
+        seen = unique.get(guid)
+        if seen is None or (record.get('modifiedDate') or '') > (seen.get('modifiedDate') or ''):
+            unique[guid] = record
+    return list(unique.values()) + no_guid
+
+
+class StreamingDeduper:
+    """
+    Drops exact duplicate records as they stream in, ie: the same employee returned by every location.
+
+    Records are keyed on guid plus a digest of their content, so only a small key per record is kept in memory and
+    key order within the dicts doesn't matter.
+    """
+
+    def __init__(self):
+        self.seen = set()
+
+    def is_new(self, record: dict[str, Any]) -> bool:
+        key = (record.get('guid'), content_digest(record))
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+        return True
+
+    def filter(self, records: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+        for record in records:
+            if self.is_new(record):
+                yield record
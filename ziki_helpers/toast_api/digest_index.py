@@ -0,0 +1,86 @@
+import time
+import threading
+import datetime as dt
+from typing import Any
+
+from ziki_helpers.toast_api.dedup import content_digest
+from ziki_helpers.toast_api.json_store import JSONStore, LocalJSONStore, S3JSONStore
+
+# Digests older than this are dropped on save, needs to be longer than the writers' time overlap buffer
+MAX_AGE = dt.timedelta(days=2)
+
+
+class DigestIndex:
+    """
+    guid -> content digest of recently written records, so unchanged records can be skipped on the next run.
+
+    Load before a run and call should_write for each item. Digests stay pending under their group (ie: the location)
+    until commit(group) is called once that group's items are flushed, and only committed digests are saved. A failed
+    run therefore never marks records as written that never were. The index is uploaded whole, so save once per run
+    rather than per group.
+    """
+
+    def __init__(self, store: JSONStore, max_age: dt.timedelta = MAX_AGE):
+        self.store = store
+        self.max_age = max_age
+        self.entries = dict()  # guid -> [digest, written at (epoch seconds)]
+        self.pending = dict()  # group -> {guid -> [digest, written at]}, not yet flushed
+        self.written = 0
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def load(self) -> 'DigestIndex':
+        entries = self.store.load() or dict()
+        cutoff = time.time() - self.max_age.total_seconds()
+        self.entries = {guid: entry for guid, entry in entries.items() if entry[1] >= cutoff}
+        return self
+
+    def commit(self, group: Any = None) -> None:
+        """Mark a group's pending digests as written, once its items are flushed. Persisted by the next save."""
+        with self.lock:
+            self.entries.update(self.pending.pop(group, dict()))
+
+    def save(self) -> None:
+        """Persist the committed digests, once per run. Pending groups are left out."""
+        cutoff = time.time() - self.max_age.total_seconds()
+        with self.lock:
+            self.store.save({guid: entry for guid, entry in self.entries.items() if entry[1] >= cutoff})
+
+    def should_write(self, record: dict[str, Any], group: Any = None) -> bool:
+        """
+        Check a record against the index, recording it as pending for the group if it's new or changed.
+        Records without a guid are always written.
+        """
+        guid = record.get('guid')
+        if guid is None:
+            with self.lock:
+                self.written += 1
+            return True
+
+        digest = content_digest(record)
+        with self.lock:
+            group_entries = self.pending.setdefault(group, dict())
+            entry = group_entries.get(guid) or self.entries.get(guid)
+            if entry is not None and entry[0] == digest:
+                self.skipped += 1
+                return False
+            group_entries[guid] = [digest, time.time()]
+            self.written += 1
+            return True
+
+    def summary(self) -> str:
+        return f'Written: {self.written}, skipped unchanged: {self.skipped}'
+
+
+class LocalDigestIndex(DigestIndex):
+    """Digest index in a gzipped JSON file on local disk."""
+
+    def __init__(self, path: str, max_age: dt.timedelta = MAX_AGE):
+        super().__init__(LocalJSONStore(path, compress=True), max_age)
+
+
+class S3DigestIndex(DigestIndex):
+    """Digest index in S3, shared between runs on different machines."""
+
+    def __init__(self, bucket_name: str, key: str, max_age: dt.timedelta = MAX_AGE):
+        super().__init__(S3JSONStore(bucket_name, key, compress=True), max_age)
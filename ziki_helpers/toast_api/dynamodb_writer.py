@@ -0,0 +1,173 @@
+import time
+import threading
+from typing import Any, Union
+
+from botocore.exceptions import ClientError
+
+from ziki_helpers.toast_api.http_client import TokenBucket, backoff_seconds
+
+# Max items per BatchWriteItem call
+BATCH_SIZE = 25
+# Starting and max write rate per table, consumed WCU / second. The rate adapts between MIN_RATE and max_rate.
+INITIAL_RATE = 200.0
+MAX_RATE = 2000.0
+MIN_RATE = 5.0
+# WCU a batch can take without waiting, a full batch of items up to 1KB
+BURST_WCU = float(BATCH_SIZE)
+# Additive increase per successful batch (WCU / second), multiplicative decrease per throttle
+RATE_INCREASE = 5.0
+RATE_DECREASE = 0.5
+# Retries of throttled batches / unprocessed items before giving up
+MAX_RETRIES = 10
+
+THROTTLE_ERROR_CODES = {'ProvisionedThroughputExceededException', 'ThrottlingException', 'RequestLimitExceeded'}
+
+
+class WriteController:
+    """
+    Write rate shared by every writer on one table, in consumed WCU per second and adjusted with AIMD.
+
+    A batch takes its estimated WCU (items times the WCU per item seen so far) before it's sent, and the difference
+    to the ConsumedCapacity DynamoDB reports is settled once it's back, so large items are paced by what they
+    actually cost. Each clean batch raises the rate by RATE_INCREASE, each throttle (an error or unprocessed items)
+    cuts it by RATE_DECREASE, so concurrent writers settle just under what the table can take. Also keeps the run's
+    consumed capacity, throttle and retry counts.
+    """
+
+    def __init__(self, table_name: str, initial_rate: float = INITIAL_RATE, max_rate: float = MAX_RATE):
+        self.table_name = table_name
+        self.max_rate = max_rate
+        self.bucket = TokenBucket(initial_rate, BURST_WCU)
+        self.lock = threading.Lock()
+
+        self.batches = 0
+        self.items = 0
+        self.consumed_wcu = 0.0
+        self.throttle_events = 0
+        self.unprocessed_items = 0
+        self.retries = 0
+        self.throttle_wait_seconds = 0.0
+        self.started = time.monotonic()
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    @property
+    def wcu_per_item(self) -> float:
+        """Average WCU per written item so far, 1 (an item up to 1KB) until a batch has come back."""
+        with self.lock:
+            return self.consumed_wcu / self.items if self.items and self.consumed_wcu else 1.0
+
+    def acquire(self, n_items: int) -> float:
+        """
+        Wait for the estimated WCU of a batch.
+        :return: the estimate taken, to hand back to record_success
+        """
+        # Capped at the bucket size so a batch of large items can still go, the rest is settled afterwards
+        estimated_wcu = min(BURST_WCU, n_items * self.wcu_per_item)
+        self.bucket.acquire(estimated_wcu)
+        return estimated_wcu
+
+    def record_success(self, n_items: int, consumed_wcu: float, estimated_wcu: float) -> None:
+        with self.lock:
+            self.batches += 1
+            self.items += n_items
+            self.consumed_wcu += consumed_wcu
+            self.bucket.rate = min(self.max_rate, self.bucket.rate + RATE_INCREASE)
+        self.bucket.charge(consumed_wcu - estimated_wcu)
+
+    def record_throttle(self, n_unprocessed: int, wait: float) -> None:
+        with self.lock:
+            self.throttle_events += 1
+            self.unprocessed_items += n_unprocessed
+            self.retries += 1
+            self.throttle_wait_seconds += wait
+            self.bucket.rate = max(MIN_RATE, self.bucket.rate * RATE_DECREASE)
+        self.bucket.pause(wait)
+
+    def summary(self) -> dict[str, Any]:
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                'table': self.table_name,
+                'batches': self.batches,
+                'items': self.items,
+                'consumed_wcu': round(self.consumed_wcu, 1),
+                'wcu_per_second': round(self.consumed_wcu / elapsed, 1) if elapsed else 0.0,
+                'throttle_events': self.throttle_events,
+                'unprocessed_items': self.unprocessed_items,
+                'retries': self.retries,
+                'throttle_wait_seconds': round(self.throttle_wait_seconds, 3),
+                'wcu_per_item': round(self.consumed_wcu / self.items, 2) if self.items else 0.0,
+                'final_rate': round(self.bucket.rate, 1),
+            }
+
+
+class ThrottledBatchWriter:
+    """
+    Drop in for table.batch_writer() that paces writes with a WriteController.
+
+    Sends BatchWriteItem calls with ReturnConsumedCapacity, retries unprocessed items and throttling errors with
+    backoff, and reports both to the controller. Not thread safe, give each worker its own writer.
+    """
+
+    def __init__(self, table, controller: WriteController, overwrite_by_pkeys: Union[list[str], None] = None):
+        self.table = table
+        self.client = table.meta.client
+        self.controller = controller
+        self.overwrite_by_pkeys = overwrite_by_pkeys
+        self.buffer = []
+
+    def __enter__(self) -> 'ThrottledBatchWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # Same as boto3's batch writer, flush what's left even if the block raised
+        while self.buffer:
+            self._flush()
+
+    def put_item(self, Item: dict[str, Any]) -> None:
+        if self.overwrite_by_pkeys:
+            key = [Item.get(key_name) for key_name in self.overwrite_by_pkeys]
+            self.buffer = [
+                request for request in self.buffer
+                if [request['PutRequest']['Item'].get(key_name) for key_name in self.overwrite_by_pkeys] != key
+            ]
+        self.buffer.append({'PutRequest': {'Item': Item}})
+        if len(self.buffer) >= BATCH_SIZE:
+            self._flush()
+
+    def _flush(self) -> None:
+        requests = self.buffer[:BATCH_SIZE]
+        self.buffer = self.buffer[BATCH_SIZE:]
+
+        attempt = 0
+        while requests:
+            estimated = self.controller.acquire(len(requests))
+            try:
+                response = self.client.batch_write_item(
+                    RequestItems={self.table.name: requests},
+                    ReturnConsumedCapacity='TOTAL',
+                )
+            except ClientError as e:
+                if e.response['Error']['Code'] not in THROTTLE_ERROR_CODES or attempt >= MAX_RETRIES:
+                    raise e
+                self.controller.record_throttle(len(requests), backoff_seconds(attempt))
+                attempt += 1
+                continue
+
+            unprocessed = response.get('UnprocessedItems', {}).get(self.table.name, [])
+            if 'ConsumedCapacity' in response:
+                consumed = sum(capacity.get('CapacityUnits', 0) for capacity in response['ConsumedCapacity'])
+            else:
+                # Not reported (ie: DynamoDB Local), keep the estimate
+                consumed = estimated
+            self.controller.record_success(len(requests) - len(unprocessed), consumed, estimated)
+
+            if unprocessed:
+                if attempt >= MAX_RETRIES:
+                    raise RuntimeError(f'{len(unprocessed)} items still unprocessed in {self.table.name} after {attempt} retries')
+                self.controller.record_throttle(len(unprocessed), backoff_seconds(attempt))
+                attempt += 1
+            requests = unprocessed
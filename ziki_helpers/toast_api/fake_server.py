@@ -0,0 +1,462 @@
+"""
+Local stand-in for the Toast API endpoints used by ToastConnector.
+
+Serves synthetic (or recorded) data with configurable latency, page counts and injected 429s, so extraction
+throughput and concurrency changes can be benchmarked offline and reproducibly:
+
+    with FakeToastServer(FakeToastData(locations=5), latency=0.05) as server:
+        conn = ToastConnector(toast_token=FAKE_TOAST_TOKEN, api_server=server.url, persistent_menu_cache=False)
+        conn.get_orders_by_business_date(20230801, server.data.locations[0])
+"""
+import os
+import json
+import uuid
+import time
+import random
+import threading
+import datetime as dt
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Any, Union
+from urllib.parse import urlparse, parse_qs
+
+from ziki_helpers.toast_api.connector import (
+    orders_path, labor_path, config_path, labor_base_path, menu_path, menu_items_path, inventory_path,
+    last_updated_path, restaurant_path, ORDERS_PAGE_SIZE,
+)
+from ziki_helpers.toast_api.http_client import LOCATION_HEADER
+
+# Headers that stand in for a real ToastToken
+FAKE_TOAST_TOKEN = {'Authorization': 'Bearer fake-token'}
+
+NAMESPACE = uuid.UUID('6f1c1a52-2a4a-4c55-9b55-1f1b0a6d3a10')
+
+
+def fake_guid(*parts: Any) -> str:
+    """Deterministic guid, so the same seed always produces the same data."""
+    return str(uuid.uuid5(NAMESPACE, '-'.join(str(part) for part in parts)))
+
+
+def format_toast_datetime(date_time: dt.datetime) -> str:
+    return date_time.strftime('%Y-%m-%dT%H:%M:%S.') + f'{date_time.microsecond // 1000:03d}+0000'
+
+
+def parse_toast_datetime(date_string: str) -> dt.datetime:
+    return dt.datetime.fromisoformat(date_string.replace('Z', '+00:00')).astimezone(dt.timezone.utc)
+
+
+class FakeToastData:
+    """
+    Synthetic Toast data, generated deterministically from a seed.
+
+    Pass `recorded_dir` to serve recorded responses instead, laid out as `{recorded_dir}/{location_guid}/{name}.json`
+    where name is one of orders, labor, menu, menu_items, employees, jobs, diningOptions, alternatePaymentTypes.
+    Anything not recorded falls back to synthetic data.
+    """
+
+    def __init__(self, locations: Union[int, list[str]] = 3, orders_per_day: int = 250, labor_per_day: int = 20,
+                 employees: int = 50, jobs: int = 5, menu_items: int = 300, seed: int = 0, recorded_dir: Union[str, None] = None):
+        if isinstance(locations, int):
+            locations = [fake_guid('location', seed, i) for i in range(locations)]
+        self.locations = locations
+        self.orders_per_day = orders_per_day
+        self.labor_per_day = labor_per_day
+        self.employee_count = employees
+        self.job_count = jobs
+        self.menu_item_count = menu_items
+        self.seed = seed
+        self.recorded_dir = recorded_dir
+        self.last_updated = format_toast_datetime(dt.datetime(2023, 1, 1, tzinfo=dt.timezone.utc))
+        # Generated days are kept, so paging through a day doesn't regenerate it per page
+        self.generated = dict()
+
+    def recorded(self, location_guid: str, name: str) -> Union[Any, None]:
+        if self.recorded_dir is None:
+            return None
+        path = os.path.join(self.recorded_dir, location_guid, f'{name}.json')
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def orders_for_date(self, location_guid: str, business_date: int) -> list[dict[str, Any]]:
+        key = ('orders', location_guid, business_date)
+        if key not in self.generated:
+            self.generated[key] = self._orders_for_date(location_guid, business_date)
+        return self.generated[key]
+
+    def _orders_for_date(self, location_guid: str, business_date: int) -> list[dict[str, Any]]:
+        recorded = self.recorded(location_guid, 'orders')
+        if recorded is not None:
+            return [order for order in recorded if order.get('businessDate') == business_date]
+
+        rng = random.Random(f'{self.seed}-{location_guid}-{business_date}')
+        day = dt.datetime.strptime(str(business_date), '%Y%m%d').replace(hour=15, tzinfo=dt.timezone.utc)
+        orders = []
+        for i in range(self.orders_per_day):
+            opened = day + dt.timedelta(seconds=rng.randint(0, 12 * 60 * 60))
+            modified = opened + dt.timedelta(minutes=rng.randint(1, 90))
+            amount = round(rng.uniform(5, 60), 2)
+            orders.append({
+                'guid': fake_guid('order', location_guid, business_date, i),
+                'businessDate': business_date,
+                'openedDate': format_toast_datetime(opened),
+                'modifiedDate': format_toast_datetime(modified),
+                'estimatedFulfillmentDate': format_toast_datetime(opened + dt.timedelta(minutes=15)),
+                'diningOption': {'guid': fake_guid('dining_option', rng.randint(0, 2))},
+                'voided': False,
+                'deleted': False,
+                'checks': [{
+                    'guid': fake_guid('check', location_guid, business_date, i),
+                    'voided': False,
+                    'deleted': False,
+                    'paymentStatus': 'PAID',
+                    'amount': amount,
+                    'selections': [
+                        {
+                            'guid': fake_guid('selection', location_guid, business_date, i, j),
+                            'item': {'guid': fake_guid('menu_item', rng.randrange(self.menu_item_count))},
+                            'price': round(amount / 2, 2),
+                            'quantity': 1.0,
+                        } for j in range(rng.randint(1, 4))
+                    ],
+                    'payments': [{
+                        'guid': fake_guid('payment', location_guid, business_date, i),
+                        'paymentStatus': 'CAPTURED',
+                        'refundStatus': 'NONE',
+                        'amount': amount,
+                        'tipAmount': round(amount * 0.15, 2),
+                    }],
+                }],
+            })
+        return orders
+
+    def orders_between(self, location_guid: str, start: dt.datetime, end: dt.datetime) -> list[dict[str, Any]]:
+        orders = []
+        day = (start - dt.timedelta(days=1)).date()
+        while day <= end.date():
+            for order in self.orders_for_date(location_guid, int(day.strftime('%Y%m%d'))):
+                if start <= parse_toast_datetime(order['modifiedDate']) <= end:
+                    orders.append(order)
+            day += dt.timedelta(days=1)
+        return orders
+
+    def labor_for_date(self, location_guid: str, business_date: int) -> list[dict[str, Any]]:
+        key = ('labor', location_guid, business_date)
+        if key not in self.generated:
+            self.generated[key] = self._labor_for_date(location_guid, business_date)
+        return self.generated[key]
+
+    def _labor_for_date(self, location_guid: str, business_date: int) -> list[dict[str, Any]]:
+        recorded = self.recorded(location_guid, 'labor')
+        if recorded is not None:
+            return [entry for entry in recorded if int(entry.get('businessDate')) == business_date]
+
+        rng = random.Random(f'{self.seed}-labor-{location_guid}-{business_date}')
+        day = dt.datetime.strptime(str(business_date), '%Y%m%d').replace(hour=13, tzinfo=dt.timezone.utc)
+        entries = []
+        for i in range(self.labor_per_day):
+            in_date = day + dt.timedelta(minutes=rng.randint(0, 6 * 60))
+            hours = round(rng.uniform(3, 9), 2)
+            out_date = in_date + dt.timedelta(hours=hours)
+            entries.append({
+                'guid': fake_guid('time_entry', location_guid, business_date, i),
+                'businessDate': str(business_date),
+                'inDate': format_toast_datetime(in_date),
+                'outDate': format_toast_datetime(out_date),
+                'modifiedDate': format_toast_datetime(out_date + dt.timedelta(minutes=5)),
+                'regularHours': hours,
+                'employeeReference': {'guid': fake_guid('employee', rng.randrange(self.employee_count))},
+                'jobReference': {'guid': fake_guid('job', rng.randrange(self.job_count))},
+            })
+        return entries
+
+    def labor_between(self, location_guid: str, start: dt.datetime, end: dt.datetime) -> list[dict[str, Any]]:
+        entries = []
+        day = (start - dt.timedelta(days=1)).date()
+        while day <= end.date():
+            for entry in self.labor_for_date(location_guid, int(day.strftime('%Y%m%d'))):
+                if start <= parse_toast_datetime(entry['modifiedDate']) <= end:
+                    entries.append(entry)
+            day += dt.timedelta(days=1)
+        return entries
+
+    def config(self, location_guid: str, config: str) -> list[dict[str, Any]]:
+        recorded = self.recorded(location_guid, config)
+        if recorded is not None:
+            return recorded
+        return [{'guid': fake_guid(config, i), 'name': f'{config} {i}'} for i in range(3)]
+
+    def labor_mappings(self, location_guid: str, labor_config: str) -> list[dict[str, Any]]:
+        recorded = self.recorded(location_guid, labor_config)
+        if recorded is not None:
+            return recorded
+        if labor_config == 'employees':
+            return [
+                {'guid': fake_guid('employee', i), 'firstName': 'Employee', 'lastName': str(i)}
+                for i in range(self.employee_count)
+            ]
+        return [{'guid': fake_guid('job', i), 'title': f'Job {i}'} for i in range(self.job_count)]
+
+    def menu_items(self, location_guid: str) -> list[dict[str, Any]]:
+        recorded = self.recorded(location_guid, 'menu_items')
+        if recorded is not None:
+            return recorded
+        return [
+            {
+                'guid': fake_guid('menu_item', i),
+                'name': f'Item {i}',
+                'visibility': 'ALL',
+                'orderableOnline': 'YES',
+                'optionGroups': [{'guid': fake_guid('option_group', i % 10)}],
+            } for i in range(self.menu_item_count)
+        ]
+
+    def menu(self, location_guid: str) -> dict[str, Any]:
+        recorded = self.recorded(location_guid, 'menu')
+        if recorded is not None:
+            return recorded
+        options = {
+            str(i): {'guid': fake_guid('modifier_option', i), 'referenceId': i, 'name': f'Modifier {i}'}
+            for i in range(20)
+        }
+        groups = {
+            str(100 + i): {
+                'guid': fake_guid('modifier_group', i), 'referenceId': 100 + i, 'name': f'Modifier Group {i}',
+                'modifierOptionReferences': [i * 4 + j for j in range(4)],
+            } for i in range(5)
+        }
+        items = [
+            {'guid': fake_guid('menu_item', i), 'name': f'Item {i}', 'modifierGroupReferences': [100 + i % 5]}
+            for i in range(self.menu_item_count)
+        ]
+        return {
+            'restaurantGuid': location_guid,
+            'lastUpdated': self.last_updated,
+            'menus': [{'name': 'Menu', 'menuGroups': [{'name': 'Group', 'menuItems': items}]}],
+            'modifierGroupReferences': groups,
+            'modifierOptionReferences': options,
+        }
+
+
+class FakeToastServer:
+    """
+    Threaded HTTP server answering the Toast endpoints ToastConnector calls.
+
+    :param latency: seconds added to every response, or a (min, max) tuple for random latency
+    :param rate_limit_probability: chance of answering any request with a 429
+    :param retry_after: Retry-After seconds sent with injected 429s
+    :param menu_items_page_size: page size for the Toast-Next-Page-Token paged menuItems endpoint
+    """
+
+    def __init__(self, data: Union[FakeToastData, None] = None, latency: Union[float, tuple[float, float]] = 0.0,
+                 rate_limit_probability: float = 0.0, retry_after: float = 1.0, menu_items_page_size: int = 100,
+                 host: str = '127.0.0.1', port: int = 0, seed: int = 0):
+        self.data = data if data is not None else FakeToastData()
+        self.latency = latency
+        self.rate_limit_probability = rate_limit_probability
+        self.retry_after = retry_after
+        self.menu_items_page_size = menu_items_page_size
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+
+        # Request counts by (path, status), for checking what a benchmark actually did
+        self.request_counts = Counter()
+        self.counts_lock = threading.Lock()
+        # Requests being handled right now and the most seen at once, for checking concurrency limits
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+        self.httpd = ThreadingHTTPServer((host, port), self.handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'FakeToastServer':
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> 'FakeToastServer':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def delay(self) -> None:
+        if isinstance(self.latency, tuple):
+            with self.rng_lock:
+                latency = self.rng.uniform(*self.latency)
+        else:
+            latency = self.latency
+        if latency:
+            time.sleep(latency)
+
+    def inject_rate_limit(self) -> bool:
+        if not self.rate_limit_probability:
+            return False
+        with self.rng_lock:
+            return self.rng.random() < self.rate_limit_probability
+
+    def enter(self) -> None:
+        with self.counts_lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def leave(self) -> None:
+        with self.counts_lock:
+            self.in_flight -= 1
+
+    def count(self, path: str, status: int) -> None:
+        with self.counts_lock:
+            self.request_counts[(path, status)] += 1
+
+    def route(self, path: str, query: dict[str, str], location_guid: str) -> tuple[int, Any, dict[str, str]]:
+        """Returns status, body and extra headers for a request."""
+        data = self.data
+
+        if path == orders_path:
+            page = int(query.get('page', 1))
+            page_size = min(int(query.get('pageSize', ORDERS_PAGE_SIZE)), ORDERS_PAGE_SIZE)
+            if 'businessDate' in query:
+                orders = data.orders_for_date(location_guid, int(query['businessDate']))
+            else:
+                orders = data.orders_between(location_guid, parse_toast_datetime(query['startDate']), parse_toast_datetime(query['endDate']))
+            return 200, orders[(page - 1) * page_size:page * page_size], {}
+
+        if path == labor_path:
+            if 'businessDate' in query:
+                return 200, data.labor_for_date(location_guid, int(query['businessDate'])), {}
+            start = parse_toast_datetime(query['modifiedStartDate'])
+            end = parse_toast_datetime(query['modifiedEndDate'])
+            if end - start > dt.timedelta(days=30):
+                return 400, {'message': 'Time range must be 30 days or less.'}, {}
+            return 200, data.labor_between(location_guid, start, end), {}
+
+        if path.startswith(labor_base_path + '/'):
+            labor_config = path[len(labor_base_path) + 1:]
+            mappings = data.labor_mappings(location_guid, labor_config)
+            ids = query.get(labor_config[:-1] + 'Ids')
+            if ids is not None:
+                ids = ids.split(',')
+                if len(ids) > 100:
+                    return 400, {'message': 'Maximum of 100 IDs.'}, {}
+                mappings = [mapping for mapping in mappings if mapping['guid'] in ids]
+            return 200, mappings, {}
+
+        if path == menu_items_path:
+            items = data.menu_items(location_guid)
+            offset = int(query.get('pageToken', 0))
+            page = items[offset:offset + self.menu_items_page_size]
+            headers = {}
+            if offset + self.menu_items_page_size < len(items):
+                headers['Toast-Next-Page-Token'] = str(offset + self.menu_items_page_size)
+            return 200, page, headers
+
+        if path.startswith(menu_items_path + '/'):
+            item_guid = path[len(menu_items_path) + 1:]
+            for item in data.menu_items(location_guid):
+                if item['guid'] == item_guid:
+                    return 200, item, {}
+            return 404, {'message': 'Menu item not found.'}, {}
+
+        if path.startswith(config_path + '/'):
+            return 200, data.config(location_guid, path[len(config_path) + 1:]), {}
+
+        if path == menu_path:
+            return 200, data.menu(location_guid), {}
+
+        if path == last_updated_path:
+            return 200, {'restaurantGuid': location_guid, 'lastUpdated': data.last_updated}, {}
+
+        if path == inventory_path:
+            items = data.menu_items(location_guid)[:3]
+            return 200, [{'guid': item['guid'], 'status': 'OUT_OF_STOCK'} for item in items], {}
+
+        if path.startswith(restaurant_path + '/'):
+            return 200, {'guid': path[len(restaurant_path) + 1:], 'general': {'name': 'Fake Restaurant'}}, {}
+
+        return 404, {'message': f'Unknown endpoint {path}'}, {}
+
+    def handler_class(self) -> type:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+                location_guid = self.headers.get(LOCATION_HEADER)
+
+                # Counted until the response is ready, before it's sent, so the client can't start its next request
+                # while this one still counts
+                server.enter()
+                try:
+                    server.delay()
+                    if server.inject_rate_limit():
+                        status, body, headers = 429, {'message': 'Rate limit exceeded.'}, {'Retry-After': str(server.retry_after)}
+                    elif location_guid is None:
+                        status, body, headers = 400, {'message': f'Missing {LOCATION_HEADER} header.'}, {}
+                    else:
+                        status, body, headers = server.route(parsed.path, query, location_guid)
+                    server.count(parsed.path, status)
+                finally:
+                    server.leave()
+
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                # Keep benchmarks quiet
+                pass
+
+        return Handler
+
+
+if __name__ == '__main__':
+    # Benchmark a multi-location orders pull against the fake server
+    import argparse
+    from ziki_helpers.toast_api.connector import ToastConnector
+    from ziki_helpers.toast_api.http_client import ToastHTTPClient
+    from ziki_helpers.toast_api.async_connector import fetch_for_locations
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--locations', type=int, default=5)
+    parser.add_argument('--orders-per-day', type=int, default=500)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--rate-limit-probability', type=float, default=0.0)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--prefetch', type=int, default=0)
+    args = parser.parse_args()
+
+    fake_data = FakeToastData(locations=args.locations, orders_per_day=args.orders_per_day)
+    with FakeToastServer(fake_data, latency=args.latency, rate_limit_probability=args.rate_limit_probability, retry_after=0.1) as fake_server:
+        conn = ToastConnector(
+            http_client=ToastHTTPClient(), persistent_menu_cache=False,
+            toast_token=FAKE_TOAST_TOKEN, api_server=fake_server.url,
+        )
+        start_time = time.perf_counter()
+        results = fetch_for_locations(
+            conn, 'get_orders_by_business_date', fake_data.locations, 20230801,
+            prefetch=args.prefetch, max_concurrency=args.concurrency,
+        )
+        elapsed = time.perf_counter() - start_time
+
+    n_orders = sum(len(orders) for orders in results.values())
+    print(f'{n_orders} orders from {len(results)} locations in {elapsed:.2f}s ({n_orders / elapsed:.0f} orders/s)')
+    print(dict(fake_server.request_counts))
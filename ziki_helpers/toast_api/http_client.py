@@ -0,0 +1,214 @@
+import random
+import threading
+import time
+import email.utils
+import datetime as dt
+from typing import Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ziki_helpers.toast_api.metrics import ConnectorMetrics
+
+
+# Toast rate limits, per restaurant location: 20 requests / second and 10,000 requests / 15 minutes
+LOCATION_RATE_PER_SECOND = 10_000 / (15 * 60)
+LOCATION_BURST = 20
+# The menus API is limited to 1 request / second per location
+MENU_RATE_PER_SECOND = 1.0
+MENU_BURST = 1
+# Cap across all locations, keeps a wide fan out from tripping the client level limit
+GLOBAL_RATE_PER_SECOND = 50.0
+GLOBAL_BURST = 50
+
+# Retry settings
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 6
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+REQUEST_TIMEOUT_SECONDS = 60
+
+# Connection pool size, should be at least the number of threads sharing the session
+POOL_SIZE = 32
+# Max requests in flight at once across every thread sharing the client. Location fan out, order prefetch, labor
+# windows and ID chunks each run their own pools, this is what bounds them all together.
+MAX_IN_FLIGHT = POOL_SIZE
+
+LOCATION_HEADER = 'Toast-Restaurant-External-ID'
+
+
+class TokenBucket:
+    """Thread safe token bucket. Blocks callers until a token is available."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self, tokens: float = 1) -> tuple[float, float]:
+        """
+        Take tokens from the bucket, sleeping until they're available.
+        :return: seconds spent waiting for tokens, and seconds spent held by pause()
+        """
+        paced = 0.0
+        paused = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                    is_pause = True
+                elif self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return paced, paused
+                else:
+                    wait = (tokens - self.tokens) / self.rate
+                    is_pause = False
+            time.sleep(wait)
+            if is_pause:
+                paused += wait
+            else:
+                paced += wait
+
+    def charge(self, tokens: float) -> None:
+        """
+        Take tokens without waiting, ie: to settle a cost only known once the request is done. Negative gives tokens
+        back. The bucket can go below zero, later callers then wait off the difference.
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens - tokens)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every caller for the given time, ie: after the server says to back off."""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+def parse_retry_after(value: Union[str, None]) -> Union[float, None]:
+    """Parse a Retry-After header, given as either seconds or an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - dt.datetime.now(dt.timezone.utc)).total_seconds())
+
+
+def backoff_seconds(attempt: int) -> float:
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+class ToastHTTPClient:
+    """
+    Keep-alive session shared by the Toast connectors.
+
+    Requests are paced by a global token bucket and a bucket per location (and per location for the menus API), and at
+    most max_in_flight are sent at once. 429s and 5xxs are retried, honoring Retry-After when given and backing off exponentially otherwise.
+    """
+
+    def __init__(self, pool_size: int = POOL_SIZE, max_retries: int = MAX_RETRIES, timeout: float = REQUEST_TIMEOUT_SECONDS,
+                 max_in_flight: int = MAX_IN_FLIGHT):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+
+        # Latency, throughput and retry counters per endpoint and location
+        self.metrics = ConnectorMetrics()
+
+        self.global_bucket = TokenBucket(GLOBAL_RATE_PER_SECOND, GLOBAL_BURST)
+        self.location_buckets = dict()
+        self.lock = threading.Lock()
+
+    def location_bucket(self, location_guid: Union[str, None], url: str) -> TokenBucket:
+        is_menu = '/menus/' in url
+        key = (location_guid, is_menu)
+        with self.lock:
+            if key not in self.location_buckets:
+                if is_menu:
+                    self.location_buckets[key] = TokenBucket(MENU_RATE_PER_SECOND, MENU_BURST)
+                else:
+                    self.location_buckets[key] = TokenBucket(LOCATION_RATE_PER_SECOND, LOCATION_BURST)
+            return self.location_buckets[key]
+
+    def get(self, url: str, headers: dict[str, str], params: Union[dict, None] = None) -> requests.Response:
+        """
+        GET a Toast endpoint, retrying throttled and failed calls.
+        Raises requests.HTTPError once retries are exhausted or for non-retryable statuses.
+        """
+        location_guid = headers.get(LOCATION_HEADER)
+        bucket = self.location_bucket(location_guid, url)
+
+        attempt = 0
+        while True:
+            global_paced, global_paused = self.global_bucket.acquire()
+            location_paced, location_paused = bucket.acquire()
+            # Pauses only come from 429s, see below
+            self.metrics.record_wait(url, location_guid, pacing=global_paced + location_paced,
+                                     rate_limited=global_paused + location_paused)
+
+            request_start = time.perf_counter()
+            try:
+                with self.in_flight:
+                    response = self.session.get(url, headers=headers, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                self.metrics.record_request(url, location_guid, time.perf_counter() - request_start, 0, 599)
+                if attempt >= self.max_retries:
+                    raise
+                self.metrics.record_retry(url, location_guid, rate_limited=False)
+                delay = backoff_seconds(attempt)
+                time.sleep(delay)
+                self.metrics.record_wait(url, location_guid, backoff=delay)
+                attempt += 1
+                continue
+            self.metrics.record_request(url, location_guid, time.perf_counter() - request_start, len(response.content), response.status_code)
+
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                delay = parse_retry_after(response.headers.get('Retry-After'))
+                if delay is None:
+                    delay = backoff_seconds(attempt)
+                self.metrics.record_retry(url, location_guid, rate_limited=response.status_code == 429)
+                if response.status_code == 429:
+                    # Hold every request for this location, not just this one
+                    bucket.pause(delay)
+                else:
+                    time.sleep(delay)
+                    self.metrics.record_wait(url, location_guid, backoff=delay)
+                attempt += 1
+                continue
+
+            response.raise_for_status()
+            return response
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client() -> ToastHTTPClient:
+    """Client shared by every connector in the process, so they share one connection pool and rate limit."""
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = ToastHTTPClient()
+        return _default_client
@@ -0,0 +1,105 @@
+import os
+import abc
+import gzip
+import json
+from typing import Any, Union
+
+from botocore.exceptions import ClientError
+
+from ziki_helpers.aws.s3 import s3, is_gzip
+
+
+class JSONStore(abc.ABC):
+    """
+    One JSON document read and written whole, ie: a watermark file, backfill manifest or digest index.
+
+    Subclasses only move bytes. A missing or unreadable document loads as None, so callers start fresh.
+    :param compress: gzip the document, for large ones like digest indexes and menus
+    :param indent: indent the JSON, for small documents worth reading by hand
+    """
+
+    def __init__(self, compress: bool = False, indent: Union[int, None] = None):
+        self.compress = compress
+        self.indent = indent
+
+    def load(self) -> Union[Any, None]:
+        body = self.read()
+        if body is None:
+            return None
+        try:
+            if is_gzip(body):
+                body = gzip.decompress(body)
+            return json.loads(body)
+        except (OSError, EOFError, ValueError):
+            # Partially written or corrupt
+            return None
+
+    def save(self, document: Any) -> None:
+        separators = None if self.indent is not None else (',', ':')
+        body = json.dumps(document, indent=self.indent, separators=separators).encode('utf-8')
+        self.write(gzip.compress(body) if self.compress else body)
+
+    @abc.abstractmethod
+    def read(self) -> Union[bytes, None]:
+        """Raw document, or None if it doesn't exist."""
+
+    @abc.abstractmethod
+    def write(self, body: bytes) -> None:
+        pass
+
+    @abc.abstractmethod
+    def delete(self) -> None:
+        pass
+
+
+class LocalJSONStore(JSONStore):
+    """JSON document in a file on local disk."""
+
+    def __init__(self, path: str, compress: bool = False, indent: Union[int, None] = None):
+        super().__init__(compress, indent)
+        self.path = path
+
+    def read(self) -> Union[bytes, None]:
+        try:
+            with open(self.path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def write(self, body: bytes) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Write then rename, so a crash or a concurrent reader never sees a partial file
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, self.path)
+
+    def delete(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class S3JSONStore(JSONStore):
+    """JSON document in S3, shared between runs on different machines."""
+
+    def __init__(self, bucket_name: str, key: str, compress: bool = False, indent: Union[int, None] = None):
+        super().__init__(compress, indent)
+        self.bucket_name = bucket_name
+        self.key = key
+
+    def read(self) -> Union[bytes, None]:
+        try:
+            return s3.get_object(Bucket=self.bucket_name, Key=self.key)['Body'].read()
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchKey':
+                return None
+            raise e
+
+    def write(self, body: bytes) -> None:
+        content_type = 'application/gzip' if self.compress else 'application/json'
+        s3.put_object(Body=body, Bucket=self.bucket_name, Key=self.key, ContentType=content_type)
+
+    def delete(self) -> None:
+        s3.delete_object(Bucket=self.bucket_name, Key=self.key)
@@ -0,0 +1,205 @@
+import json
+import zlib
+import datetime as dt
+from typing import Any, Callable, Iterable, Union
+
+from ziki_helpers.aws.s3 import s3
+
+# S3 multipart parts, every part but the last has to be at least 5 MiB
+PART_SIZE = 8 * 1024 * 1024
+
+COMPRESSION_EXTENSIONS = {
+    'gzip': 'gz',
+    'zstd': 'zst',
+    None: None,
+}
+
+COMPRESSION_CONTENT_TYPES = {
+    'gzip': 'application/gzip',
+    'zstd': 'application/zstd',
+    None: 'application/x-ndjson',
+}
+
+
+def make_compressor(compression: Union[str, None]):
+    """Streaming compressor with compress / flush, like zlib.compressobj."""
+    if compression == 'gzip':
+        return zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 -> gzip container
+    if compression == 'zstd':
+        # Optional dependency, only needed for zstd landing files
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    if compression is None:
+        return None
+    raise ValueError(f'Unknown compression {compression}, use one of {list(COMPRESSION_EXTENSIONS)}')
+
+
+class MultipartUpload:
+    """
+    Streams bytes to one S3 object, uploading a part every PART_SIZE bytes.
+    Objects smaller than one part are sent with a single put_object when closed.
+    """
+
+    def __init__(self, bucket_name: str, key: str, client=None, content_type: str = 'application/x-ndjson',
+                 part_size: int = PART_SIZE):
+        self.bucket_name = bucket_name
+        self.key = key
+        self.client = client if client is not None else s3
+        self.content_type = content_type
+        self.part_size = part_size
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts = []
+        self.bytes_written = 0
+
+    def object_args(self) -> dict[str, str]:
+        return {'ContentType': self.content_type}
+
+    def write(self, data: bytes) -> None:
+        self.buffer += data
+        self.bytes_written += len(data)
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+
+    def _upload_part(self, body: bytes) -> None:
+        if self.upload_id is None:
+            response = self.client.create_multipart_upload(Bucket=self.bucket_name, Key=self.key, **self.object_args())
+            self.upload_id = response['UploadId']
+        part_number = len(self.parts) + 1
+        response = self.client.upload_part(
+            Bucket=self.bucket_name, Key=self.key, UploadId=self.upload_id, PartNumber=part_number, Body=body,
+        )
+        self.parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+
+    def close(self) -> None:
+        if self.upload_id is None:
+            self.client.put_object(Bucket=self.bucket_name, Key=self.key, Body=bytes(self.buffer), **self.object_args())
+        else:
+            if self.buffer:
+                self._upload_part(bytes(self.buffer))
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket_name, Key=self.key, UploadId=self.upload_id, MultipartUpload={'Parts': self.parts},
+            )
+        self.buffer = bytearray()
+
+    def abort(self) -> None:
+        if self.upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.bucket_name, Key=self.key, UploadId=self.upload_id)
+        self.buffer = bytearray()
+
+
+class NDJSONWriter:
+    """One compressed newline delimited JSON object in S3, written a record at a time."""
+
+    def __init__(self, bucket_name: str, key: str, compression: Union[str, None] = 'gzip', client=None):
+        self.key = key
+        self.compressor = make_compressor(compression)
+        # No Content-Encoding, the objects are .gz / .zst files. With it, HTTP clients would decompress the body on
+        # download and readers decompressing the file themselves would fail.
+        self.upload = MultipartUpload(bucket_name, key, client, content_type=COMPRESSION_CONTENT_TYPES[compression])
+        self.records = 0
+        self.uncompressed_bytes = 0
+
+    def write(self, record: dict[str, Any]) -> None:
+        line = (json.dumps(record, separators=(',', ':'), default=str) + '\n').encode('utf-8')
+        self.records += 1
+        self.uncompressed_bytes += len(line)
+        self.upload.write(self.compressor.compress(line) if self.compressor is not None else line)
+
+    def close(self) -> None:
+        if self.compressor is not None:
+            self.upload.write(self.compressor.flush())
+        self.upload.close()
+
+    def abort(self) -> None:
+        self.upload.abort()
+
+
+class PartitionedLandingWriter:
+    """
+    Lands records for one entity as compressed NDJSON, one object per partition, plus a manifest of the run.
+
+    Objects go to {entity}/location={location}/date={YYYY-MM-DD}/{run_id}.ndjson.gz, so Spark / Athena can prune on
+    location and date. The manifest at {entity}/_manifests/{run_id}.json lists every object with its record count
+    and sizes, and is only written once all objects are complete.
+    """
+
+    def __init__(self, bucket_name: str, entity: str, run_id: str, compression: Union[str, None] = 'gzip', client=None):
+        self.bucket_name = bucket_name
+        self.entity = entity
+        self.run_id = run_id
+        self.compression = compression
+        self.client = client if client is not None else s3
+        self.writers = dict()  # (location, date) -> NDJSONWriter
+
+    def key(self, location: Any, date: Union[str, dt.date]) -> str:
+        if isinstance(date, dt.date):
+            date = date.isoformat()
+        extension = COMPRESSION_EXTENSIONS[self.compression]
+        suffix = f'.ndjson.{extension}' if extension else '.ndjson'
+        return f'{self.entity}/location={location}/date={date}/{self.run_id}{suffix}'
+
+    def write(self, record: dict[str, Any], location: Any, date: Union[str, dt.date]) -> None:
+        partition = (location, date)
+        if partition not in self.writers:
+            self.writers[partition] = NDJSONWriter(self.bucket_name, self.key(location, date), self.compression, self.client)
+        self.writers[partition].write(record)
+
+    def write_all(self, records: Iterable[dict[str, Any]], partition: Callable[[dict[str, Any]], tuple[Any, Union[str, dt.date]]]) -> None:
+        """
+        :param partition: called with each record, returns its (location, date)
+        """
+        for record in records:
+            self.write(record, *partition(record))
+
+    @property
+    def records(self) -> int:
+        return sum(writer.records for writer in self.writers.values())
+
+    def manifest(self) -> dict[str, Any]:
+        return {
+            'entity': self.entity,
+            'runId': self.run_id,
+            'createdAt': dt.datetime.now(dt.timezone.utc).isoformat(timespec='milliseconds'),
+            'format': 'ndjson',
+            'compression': self.compression,
+            'records': self.records,
+            'files': [
+                {
+                    'key': writer.key,
+                    'location': location,
+                    'date': date.isoformat() if isinstance(date, dt.date) else date,
+                    'records': writer.records,
+                    'uncompressedBytes': writer.uncompressed_bytes,
+                    'bytes': writer.upload.bytes_written,
+                } for (location, date), writer in self.writers.items()
+            ],
+        }
+
+    def close(self) -> dict[str, Any]:
+        """
+        Finish every object, then write the manifest.
+        :return: the manifest
+        """
+        for writer in self.writers.values():
+            writer.close()
+        manifest = self.manifest()
+        self.client.put_object(
+            Bucket=self.bucket_name, Key=f'{self.entity}/_manifests/{self.run_id}.json',
+            Body=json.dumps(manifest, indent=2).encode('utf-8'), ContentType='application/json',
+        )
+        return manifest
+
+    def abort(self) -> None:
+        for writer in self.writers.values():
+            writer.abort()
+
+    def __enter__(self) -> 'PartitionedLandingWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
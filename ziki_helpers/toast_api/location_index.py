@@ -0,0 +1,104 @@
+import bisect
+import datetime as dt
+from typing import Any, Iterable, Union
+
+import numpy as np
+
+
+def date_to_int(date: Union[str, int, dt.date]) -> int:
+    """YYYY-MM-DD string, YYYYMMDD string / int or date -> YYYYMMDD int."""
+    if isinstance(date, dt.date):
+        return date.year * 10000 + date.month * 100 + date.day
+    if isinstance(date, str):
+        return int(date.replace('-', ''))
+    return int(date)
+
+
+class LocationIndex:
+    """
+    Business date -> location id for one location guid, built from its `info` list in the locations table.
+
+    A guid can be reused by several location ids over time, each with an optional startDate / endDate (inclusive,
+    YYYY-MM-DD). The dates are split into non overlapping segments with integer YYYYMMDD boundaries, each mapped to the
+    first matching entry of `info` (the same answer location_id_from_date gives), so a lookup is a single bisect.
+    """
+
+    def __init__(self, location_info: list[dict[str, Any]]):
+        self.location_info = location_info
+
+        # Single id locations apply to every date
+        if len(location_info) == 1:
+            self.boundaries = []
+            self.ids = [location_info[0]['id']]
+            return
+
+        intervals = [
+            (
+                date_to_int(loc['startDate']) if loc['startDate'] is not None else None,
+                date_to_int(loc['endDate']) + 1 if loc['endDate'] is not None else None,  # Exclusive end
+                loc['id'],
+            ) for loc in location_info
+        ]
+        self.boundaries = sorted({bound for start, end, _ in intervals for bound in (start, end) if bound is not None})
+
+        # ids[i] covers [boundaries[i - 1], boundaries[i]), with open ends on both sides
+        self.ids = []
+        for i in range(len(self.boundaries) + 1):
+            # Any date in the segment works as a representative
+            if i > 0:
+                date = self.boundaries[i - 1]
+            else:
+                date = self.boundaries[0] - 1 if self.boundaries else 0
+            self.ids.append(next(
+                (location_id for start, end, location_id in intervals
+                 if (start is None or start <= date) and (end is None or date < end)),
+                None
+            ))
+
+    def location_id(self, business_date: Union[str, int, dt.date]) -> Any:
+        """Location id for a business date. Raises ValueError if no entry covers the date."""
+        location_id = self.ids[bisect.bisect_right(self.boundaries, date_to_int(business_date))]
+        if location_id is None:
+            raise ValueError(f'No location found for date {business_date}.\nLocation info:\n{self.location_info}')
+        return location_id
+
+    def location_ids(self, business_dates: Iterable[Union[str, int]]) -> np.ndarray:
+        """
+        Vectorized location_id for a whole column of business dates, ie: a pandas Series of YYYYMMDD.
+        Raises ValueError if any date isn't covered.
+        """
+        dates = np.asarray(business_dates)
+        if dates.dtype.kind not in 'iu':
+            dates = np.array([date_to_int(date) for date in dates], dtype=np.int64)
+        ids = np.asarray(self.ids, dtype=object)[np.searchsorted(self.boundaries, dates, side='right')]
+        missing = np.equal(ids, None)
+        if missing.any():
+            raise ValueError(f'No location found for date {dates[missing][0]}.\nLocation info:\n{self.location_info}')
+        return ids
+
+    def spark_column(self, business_date_column):
+        """
+        Spark expression mapping a YYYYMMDD business date column to the location id, null where no entry matches.
+        :param business_date_column: pyspark Column or column name
+        """
+        from pyspark.sql import functions as F
+
+        date = F.col(business_date_column) if isinstance(business_date_column, str) else business_date_column
+        date = date.cast('int')
+
+        expression = None
+        for i, location_id in enumerate(self.ids):
+            if location_id is None:
+                continue
+            condition = F.lit(True)
+            if i > 0:
+                condition = condition & (date >= self.boundaries[i - 1])
+            if i < len(self.boundaries):
+                condition = condition & (date < self.boundaries[i])
+            expression = F.when(condition, location_id) if expression is None else expression.when(condition, location_id)
+        return expression if expression is not None else F.lit(None)
+
+
+def build_location_indexes(locations: list[dict[str, Any]]) -> dict[str, LocationIndex]:
+    """Location guid -> LocationIndex for every row of the locations table."""
+    return {location['guid']: LocationIndex(location['info']) for location in locations}
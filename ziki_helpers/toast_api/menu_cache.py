@@ -0,0 +1,101 @@
+import os
+import abc
+import tempfile
+import datetime as dt
+from typing import Any, Union
+
+from ziki_helpers.toast_api.json_store import JSONStore, LocalJSONStore, S3JSONStore
+
+# Local cache, /tmp is the only writable path on Lambda
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'ziki_helpers', 'menu_cache')
+# Entries older than this are refetched even if the metadata hasn't changed
+MAX_AGE = dt.timedelta(days=7)
+# Max number of location menus kept on local disk
+MAX_ENTRIES = 64
+
+
+class PersistentMenuCache(abc.ABC):
+    """
+    Menus keyed by location, stored alongside the menu's `lastUpdated` metadata.
+
+    An entry is only served when its `lastUpdated` matches the current value from the menus metadata endpoint,
+    so a warm run can skip the full menu download.
+    """
+
+    def __init__(self, max_age: dt.timedelta = MAX_AGE):
+        self.max_age = max_age
+
+    def get(self, location_guid: str, last_updated: str) -> Union[dict[str, Any], None]:
+        """Returns the cached menu if it's still current, otherwise None."""
+        entry = self.store(location_guid).load()
+        if entry is None:
+            return None
+
+        cached_at = dt.datetime.fromisoformat(entry['cachedAt'])
+        if dt.datetime.now(dt.timezone.utc) - cached_at > self.max_age:
+            self.delete(location_guid)
+            return None
+        if entry['lastUpdated'] != last_updated:
+            return None
+        return entry['menu']
+
+    def put(self, location_guid: str, last_updated: str, menu: dict[str, Any]) -> None:
+        entry = {
+            'lastUpdated': last_updated,
+            'cachedAt': dt.datetime.now(dt.timezone.utc).isoformat(timespec='milliseconds'),
+            'menu': menu,
+        }
+        self.store(location_guid).save(entry)
+
+    def delete(self, location_guid: str) -> None:
+        self.store(location_guid).delete()
+
+    @abc.abstractmethod
+    def store(self, location_guid: str) -> JSONStore:
+        """Where a location's menu is kept."""
+
+
+class LocalMenuCache(PersistentMenuCache):
+    """Menu cache on local disk, evicting the least recently written menus past `max_entries`."""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_age: dt.timedelta = MAX_AGE, max_entries: int = MAX_ENTRIES):
+        super().__init__(max_age)
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path(self, location_guid: str) -> str:
+        return os.path.join(self.directory, f'{location_guid}.json.gz')
+
+    def store(self, location_guid: str) -> JSONStore:
+        return LocalJSONStore(self.path(location_guid), compress=True)
+
+    def put(self, location_guid: str, last_updated: str, menu: dict[str, Any]) -> None:
+        super().put(location_guid, last_updated, menu)
+        self.evict()
+
+    def evict(self) -> None:
+        paths = [
+            os.path.join(self.directory, file_name) for file_name in os.listdir(self.directory)
+            if file_name.endswith('.json.gz')
+        ]
+        if len(paths) <= self.max_entries:
+            return
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:len(paths) - self.max_entries]:
+            os.remove(path)
+
+
+class S3MenuCache(PersistentMenuCache):
+    """Menu cache in S3, shared between runs on different machines. Stale entries are deleted when read."""
+
+    def __init__(self, bucket_name: str, prefix: str = 'menu_cache', max_age: dt.timedelta = MAX_AGE):
+        super().__init__(max_age)
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+
+    def key(self, location_guid: str) -> str:
+        return f'{self.prefix}/{location_guid}.json.gz'
+
+    def store(self, location_guid: str) -> JSONStore:
+        return S3JSONStore(self.bucket_name, self.key(location_guid), compress=True)
@@ -0,0 +1,53 @@
+from typing import Any
+
+
+class MenuIndex:
+    """
+    Hash map lookups over a Toast menus v2 response.
+
+    Built once per fetched menu, so modifier and menu item lookups are O(1) instead of re-flattening the menu per GUID.
+    """
+
+    def __init__(self, menu: dict[str, Any]):
+        self.menu = menu
+
+        # Modifier option GUID -> modifier option
+        self.options_by_guid = dict()
+        for option in (menu.get('modifierOptionReferences') or {}).values():
+            self.options_by_guid.setdefault(option['guid'], option)
+
+        # Modifier option referenceId -> first modifier group offering it
+        self.groups_by_option_reference = dict()
+        for group in (menu.get('modifierGroupReferences') or {}).values():
+            for option_reference in group.get('modifierOptionReferences') or []:
+                self.groups_by_option_reference.setdefault(option_reference, group)
+
+        # Modifier group referenceId -> names of the menu items using it
+        self.item_names_by_group_reference = dict()
+        for sub_menu in menu.get('menus') or []:
+            for menu_group in sub_menu.get('menuGroups') or []:
+                for item in menu_group.get('menuItems') or []:
+                    for group_reference in dict.fromkeys(item.get('modifierGroupReferences') or []):
+                        self.item_names_by_group_reference.setdefault(group_reference, []).append(item['name'])
+
+    def is_modifier(self, item_guid: str) -> bool:
+        return item_guid in self.options_by_guid
+
+    def modifier_info(self, item_guid: str) -> dict:
+        """
+        Returns the modifier information for a given modifier GUID.
+        Raises KeyError if the GUID isn't a modifier option on this menu.
+        """
+        if item_guid not in self.options_by_guid:
+            raise KeyError(f"{item_guid} is not a modifier option on this menu.")
+        option = self.options_by_guid[item_guid]
+
+        group = self.groups_by_option_reference.get(option['referenceId'])
+        if group is None:
+            raise KeyError(f"No modifier group found for modifier option {item_guid}.")
+
+        return {
+            'modifier_name': option['name'],
+            'modifier_group_name': group['name'],
+            'menu_items': list(self.item_names_by_group_reference.get(group['referenceId'], [])),
+        }
@@ -0,0 +1,175 @@
+import re
+import json
+import bisect
+import threading
+import datetime as dt
+from typing import Any
+from urllib.parse import urlparse
+
+from ziki_helpers.aws.s3 import write_to_s3
+
+# Upper bounds of the latency histogram buckets, in seconds. The last bucket catches everything slower.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+GUID_PATTERN = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+
+
+def endpoint_name(url: str) -> str:
+    """Path of a Toast URL with guids replaced, so ie: every menuItems/{guid} call is grouped together."""
+    segments = urlparse(url).path.split('/')
+    return '/'.join('{guid}' if GUID_PATTERN.match(segment) else segment for segment in segments)
+
+
+class EndpointStats:
+    """Counters for one (endpoint, location) pair."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.pages = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.rate_limited = 0
+        # Waits kept apart, so rate limit pressure isn't hidden by pacing or error backoff
+        self.pacing_wait_seconds = 0.0  # Token buckets, proactive
+        self.rate_limit_wait_seconds = 0.0  # Held after a 429
+        self.error_backoff_seconds = 0.0  # Sleeping before retrying a 5xx or connection error
+        self.latency_total_seconds = 0.0
+        self.latency_max_seconds = 0.0
+        self.latency_histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def latency_percentile(self, percentile: float) -> float:
+        """Approximate percentile, the upper bound of the bucket it falls in."""
+        target = percentile * sum(self.latency_histogram)
+        seen = 0
+        for i, count in enumerate(self.latency_histogram):
+            seen += count
+            if count and seen >= target:
+                return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else self.latency_max_seconds
+        return 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'pages': self.pages,
+            'bytes_received': self.bytes_received,
+            'retries': self.retries,
+            'rate_limited': self.rate_limited,
+            'pacing_wait_seconds': round(self.pacing_wait_seconds, 3),
+            'rate_limit_wait_seconds': round(self.rate_limit_wait_seconds, 3),
+            'error_backoff_seconds': round(self.error_backoff_seconds, 3),
+            'latency_total_seconds': round(self.latency_total_seconds, 3),
+            'latency_mean_seconds': round(self.latency_total_seconds / self.requests, 3) if self.requests else 0.0,
+            'latency_p50_seconds': self.latency_percentile(0.5),
+            'latency_p95_seconds': self.latency_percentile(0.95),
+            'latency_max_seconds': round(self.latency_max_seconds, 3),
+            'latency_histogram': dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ['inf'], self.latency_histogram)),
+        }
+
+
+class ConnectorMetrics:
+    """Thread safe request metrics per endpoint and location, recorded by ToastHTTPClient."""
+
+    def __init__(self):
+        self.stats = dict()
+        self.lock = threading.Lock()
+        self.started_at = dt.datetime.now(dt.timezone.utc)
+
+    def _stats(self, url: str, location_guid: str) -> EndpointStats:
+        key = (endpoint_name(url), location_guid)
+        if key not in self.stats:
+            self.stats[key] = EndpointStats()
+        return self.stats[key]
+
+    def record_request(self, url: str, location_guid: str, latency: float, n_bytes: int, status_code: int) -> None:
+        with self.lock:
+            stats = self._stats(url, location_guid)
+            stats.requests += 1
+            stats.bytes_received += n_bytes
+            stats.latency_total_seconds += latency
+            stats.latency_max_seconds = max(stats.latency_max_seconds, latency)
+            stats.latency_histogram[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+            if status_code == 200:
+                stats.pages += 1
+            elif status_code >= 400:
+                stats.errors += 1
+
+    def record_retry(self, url: str, location_guid: str, rate_limited: bool) -> None:
+        with self.lock:
+            stats = self._stats(url, location_guid)
+            stats.retries += 1
+            if rate_limited:
+                stats.rate_limited += 1
+
+    def record_wait(self, url: str, location_guid: str, pacing: float = 0.0, rate_limited: float = 0.0, backoff: float = 0.0) -> None:
+        """
+        :param pacing: seconds waiting on the token buckets
+        :param rate_limited: seconds held after a 429
+        :param backoff: seconds backing off before retrying an error
+        """
+        if pacing <= 0 and rate_limited <= 0 and backoff <= 0:
+            return
+        with self.lock:
+            stats = self._stats(url, location_guid)
+            stats.pacing_wait_seconds += pacing
+            stats.rate_limit_wait_seconds += rate_limited
+            stats.error_backoff_seconds += backoff
+
+    def reset(self) -> None:
+        with self.lock:
+            self.stats = dict()
+            self.started_at = dt.datetime.now(dt.timezone.utc)
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Current metrics as plain data.
+        :return: dict with per (endpoint, location) stats, per endpoint totals and overall totals
+        """
+        with self.lock:
+            rows = [
+                {'endpoint': endpoint, 'location': location_guid, **stats.to_dict()}
+                for (endpoint, location_guid), stats in sorted(self.stats.items(), key=lambda kv: (kv[0][0], str(kv[0][1])))
+            ]
+
+            by_endpoint = dict()
+            for (endpoint, _), stats in self.stats.items():
+                merged = by_endpoint.setdefault(endpoint, EndpointStats())
+                merged.requests += stats.requests
+                merged.errors += stats.errors
+                merged.pages += stats.pages
+                merged.bytes_received += stats.bytes_received
+                merged.retries += stats.retries
+                merged.rate_limited += stats.rate_limited
+                merged.pacing_wait_seconds += stats.pacing_wait_seconds
+                merged.rate_limit_wait_seconds += stats.rate_limit_wait_seconds
+                merged.error_backoff_seconds += stats.error_backoff_seconds
+                merged.latency_total_seconds += stats.latency_total_seconds
+                merged.latency_max_seconds = max(merged.latency_max_seconds, stats.latency_max_seconds)
+                merged.latency_histogram = [a + b for a, b in zip(merged.latency_histogram, stats.latency_histogram)]
+
+        totals = {
+            key: sum(stats[key] for stats in rows)
+            for key in ['requests', 'errors', 'pages', 'bytes_received', 'retries', 'rate_limited']
+        }
+        for key in ['pacing_wait_seconds', 'rate_limit_wait_seconds', 'error_backoff_seconds']:
+            totals[key] = round(sum(stats[key] for stats in rows), 3)
+        totals['latency_total_seconds'] = round(sum(stats['latency_total_seconds'] for stats in rows), 3)
+
+        return {
+            'started_at': self.started_at.isoformat(timespec='milliseconds'),
+            'snapshot_at': dt.datetime.now(dt.timezone.utc).isoformat(timespec='milliseconds'),
+            'totals': totals,
+            'endpoints': {endpoint: stats.to_dict() for endpoint, stats in sorted(by_endpoint.items())},
+            'locations': rows,
+        }
+
+    def write_json(self, path: str) -> None:
+        """Write a snapshot to a local path or an s3://bucket/key URI."""
+        summary = json.dumps(self.snapshot(), indent=2)
+        if path.startswith('s3://'):
+            bucket_name, _, file_name = path[len('s3://'):].partition('/')
+            write_to_s3(bucket_name, file_name, summary)
+        else:
+            with open(path, 'w') as f:
+                f.write(summary)
@@ -0,0 +1,61 @@
+import queue
+import threading
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar('T')
+
+# Items a producer can get ahead of its consumer
+DEFAULT_QUEUE_SIZE = 8
+
+# How often a blocked producer checks whether the consumer went away
+PUT_TIMEOUT_SECONDS = 0.1
+
+_ITEM = 'item'
+_DONE = 'done'
+_ERROR = 'error'
+
+
+def iter_in_background(iterable: Iterable[T], maxsize: int = DEFAULT_QUEUE_SIZE) -> Iterator[T]:
+    """
+    Run an iterable on a background thread, handing its items over through a bounded queue.
+
+    Lets slow reads (ie: Toast pages) carry on while the caller is busy with the previous item (ie: writing it to
+    DynamoDB). The queue bounds how far the producer gets ahead. Exceptions from the producer are raised in the
+    caller, and the producer stops once the caller stops iterating.
+    :param iterable: producer, only iterated on the background thread
+    :param maxsize: max items waiting in the queue
+    """
+    items = queue.Queue(maxsize=maxsize)
+    stopped = threading.Event()
+
+    def put(kind: str, value) -> bool:
+        while not stopped.is_set():
+            try:
+                items.put((kind, value), timeout=PUT_TIMEOUT_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put(_ITEM, item):
+                    return
+        except BaseException as e:
+            put(_ERROR, e)
+        else:
+            put(_DONE, None)
+
+    producer = threading.Thread(target=produce, name='pipeline-producer', daemon=True)
+    producer.start()
+    try:
+        while True:
+            kind, value = items.get()
+            if kind == _DONE:
+                return
+            if kind == _ERROR:
+                raise value
+            yield value
+    finally:
+        stopped.set()
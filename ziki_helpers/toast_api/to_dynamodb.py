@@ -1,10 +1,11 @@
 import os
 import datetime as dt
 from zoneinfo import ZoneInfo
-import json
 import requests
-from decimal import Decimal
 import calendar
+import threading
+from typing import Any, Callable, Iterator, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import boto3
 from toast_auth import ToastToken
@@ -12,7 +13,15 @@ from toast_auth import ToastToken
 import ziki_helpers.config.settings
 from ziki_helpers.aws.s3 import read_from_s3, write_to_s3
 from ziki_helpers.aws.dynamodb import get_entire_table
-from ziki_helpers.toast_api.connector import ToastConnector
+from ziki_helpers.toast_api.connector import ToastConnector, iter_records
+from ziki_helpers.toast_api.async_connector import DEFAULT_MAX_CONCURRENCY
+from ziki_helpers.toast_api.pipeline import iter_in_background
+from ziki_helpers.toast_api.dedup import StreamingDeduper
+from ziki_helpers.toast_api.digest_index import DigestIndex, S3DigestIndex
+from ziki_helpers.toast_api.location_index import build_location_indexes
+from ziki_helpers.toast_api.backfill_manifest import BackfillManifest, S3BackfillManifest
+from ziki_helpers.toast_api.watermarks import WatermarkStore, S3WatermarkStore
+from ziki_helpers.toast_api.dynamodb_writer import ThrottledBatchWriter, WriteController
 
 # Stores the last time orders were written to DynamoDB
 S3_BUCKET = 'ziki-dataflow'
@@ -25,6 +34,30 @@ S3_BUCKET = 'ziki-dataflow'
 TIME_OVERLAP_BUFFER = dt.timedelta(hours=4)
 us_central_timezone = ZoneInfo("America/Chicago")
 
+# Pages of orders requested ahead once a location has a full page, cuts latency on busy days
+ORDERS_PREFETCH = 4
+
+# Where the digest indexes of recently written records are kept in S3_BUCKET
+DIGEST_INDEX_PREFIX = 'digest_index'
+
+# Where the per location watermarks of the *_to_now writers are kept in S3_BUCKET
+WATERMARKS_PREFIX = 'watermarks'
+
+# Where the progress of date range backfills is kept in S3_BUCKET, so a failed backfill can be resumed
+BACKFILL_MANIFEST_PREFIX = 'backfill_manifests'
+
+# Pages fetched ahead of the DynamoDB writer in the between times writers
+PIPELINE_QUEUE_PAGES = 8
+
+# Number of locations fetched at once per mapping table in update_mappings
+MAPPINGS_MAX_WORKERS = 4
+
+# Number of locations written at once by the between times writers
+LOCATIONS_MAX_WORKERS = DEFAULT_MAX_CONCURRENCY
+
+# Number of (business date, location) units written at once by the date range backfills
+BACKFILL_MAX_WORKERS = 8
+
 
 def get_current_time_given_timezone(timezone: ZoneInfo = us_central_timezone) -> dt.datetime:
     return dt.datetime.now(timezone)
@@ -42,28 +75,6 @@ def get_date_range(start_date: dt.date, end_date: dt.date) -> list[str]:
     return date_range
 
 
-def to_hashable(obj):
-    """Recursively convert a JSON object to a hashable representation."""
-    if isinstance(obj, list):
-        return tuple(to_hashable(item) for item in obj)
-    elif isinstance(obj, dict):
-        return tuple((key, to_hashable(value)) for key, value in obj.items())
-    else:
-        return obj
-
-
-def remove_duplicates(json_list: list[dict]) -> list[dict]:
-    """Remove duplicates from a list of JSON dictionaries."""
-    seen = set()
-    unique = []
-    for json_dict in json_list:
-        hashable_dict = to_hashable(json_dict)
-        if hashable_dict not in seen:
-            seen.add(hashable_dict)
-            unique.append(json_dict)
-    return unique
-
-
 def date_int_to_dashed_string(date: int) -> str:
     """
     Convert a date in integer form (YYYYMMDD) to a dashed string (YYYY-MM-DD).
@@ -114,8 +125,21 @@ def get_start_and_end_of_last_week() -> tuple[dt.date, dt.date]:
 
 class ToastDataFlow(ToastConnector):
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, skip_unchanged: bool = True, **connector_kwargs):
+        """
+        :param skip_unchanged: keep a digest index per table in S3, so the *_to_now writers skip records that haven't
+            changed since they were last written (ie: everything in the time overlap buffer)
+        :param connector_kwargs: passed to ToastConnector
+        """
+        # DynamoDB needs Decimal instead of float, have the connector decode them that way
+        connector_kwargs.setdefault('decimal_floats', True)
+        super().__init__(**connector_kwargs)
+        self.skip_unchanged = skip_unchanged
+        # Per thread DynamoDB tables, see table()
+        self.thread_tables = threading.local()
+        # Adaptive write rate and capacity stats per table, shared by every writer on it
+        self.write_controllers = dict()
+        self.write_controllers_lock = threading.Lock()
         self.locations = get_entire_table('locations')
 
         # Change location ids to integers
@@ -130,26 +154,65 @@ class ToastDataFlow(ToastConnector):
                 ]
             } for location in self.locations
         ]
+        # Business date -> location id lookups, for guids shared by several location ids over time
+        self.location_indexes = build_location_indexes(self.locations)
+
+    def table(self, table_name: str):
+        """DynamoDB table for the current thread, boto3 resources aren't thread safe so each worker gets its own."""
+        tables = self.thread_tables.__dict__.setdefault('tables', dict())
+        if table_name not in tables:
+            tables[table_name] = boto3.session.Session().resource('dynamodb', region_name='us-east-1').Table(table_name)
+        return tables[table_name]
+
+    def batch_writer(self, table_name: str, overwrite_by_pkeys: Union[list[str], None] = None) -> ThrottledBatchWriter:
+        """
+        Batch writer for the current thread, paced by the table's shared WriteController.
+        :param overwrite_by_pkeys: drop a buffered item when another with the same keys is put before it's sent
+        """
+        with self.write_controllers_lock:
+            if table_name not in self.write_controllers:
+                self.write_controllers[table_name] = WriteController(table_name)
+            controller = self.write_controllers[table_name]
+        return ThrottledBatchWriter(self.table(table_name), controller, overwrite_by_pkeys)
+
+    def print_write_summary(self) -> None:
+        """Print consumed capacity, throttling and retries for every table written so far."""
+        with self.write_controllers_lock:
+            controllers = list(self.write_controllers.values())
+        for controller in controllers:
+            print('DynamoDB writes: ', controller.summary())
+
+    def digest_index(self, table_name: str) -> Union[DigestIndex, None]:
+        """Loaded digest index for a table, or None if skip_unchanged is off."""
+        if not self.skip_unchanged:
+            return None
+        return S3DigestIndex(S3_BUCKET, f'{DIGEST_INDEX_PREFIX}/{table_name}.json.gz').load()
+
+    def write_orders_for_location(self, business_date: int, location: dict[str, Any]) -> int:
+        """
+        Write one location's orders for a business date through its own batch writer.
+        :return: number of orders written
+        """
+        location_id = self.location_indexes[location['guid']].location_id(business_date)
+
+        count = 0
+        pages = self.iter_orders_by_business_date(business_date, location['guid'], prefetch=ORDERS_PREFETCH)
+        with self.batch_writer('orders') as batch:
+            for order in iter_records(pages):
+                order['location'] = location_id
+                batch.put_item(
+                    Item=order
+                )
+                count += 1
+        return count
 
     def write_orders_by_business_date(self, business_date: int) -> None:
         print(f"Business Date: {date_int_to_dashed_string(business_date)}")
 
-        table = boto3.resource('dynamodb', region_name='us-east-1').Table('orders')
-        with table.batch_writer() as batch:
-            for location in self.locations:
-                if not location['info'][0]['address']:  # Ignore guid placeholders for future locations
-                    continue
-                if len(location['info']) == 1:
-                    location_id = location['info'][0]['id']
-                else:
-                    location_id = location_id_from_date(location['info'], business_date)
-                data = self.get_orders_by_business_date(business_date, location['guid'])
-                for order in data:
-                    order['location'] = location_id
-                    item = json.loads(json.dumps(order), parse_float=Decimal)
-                    batch.put_item(
-                        Item=item
-                    )
+        for location in self.locations:
+            if not location['info'][0]['address']:  # Ignore guid placeholders for future locations
+                continue
+            self.write_orders_for_location(business_date, location)
         print('Done')
 
     def write_yesterday_orders(self):
@@ -165,10 +228,15 @@ class ToastDataFlow(ToastConnector):
         start_date, end_date = get_start_and_end_of_last_week()
         self.write_orders_by_date_range(start_date, end_date)
 
-    def write_orders_by_date_range(self, start: dt.date, end: dt.date) -> None:
-        dates = get_date_range(start, end)
-        for date in dates:
-            self.write_orders_by_business_date(date)
+    def write_orders_by_date_range(self, start: dt.date, end: dt.date, max_workers: int = BACKFILL_MAX_WORKERS,
+                                   resume: bool = True) -> None:
+        """
+        Write the orders for every business date in the range, inclusive.
+        :param max_workers: number of (business date, location) units written concurrently. 1 is serial.
+        :param resume: skip units finished by an earlier failed run of the same range
+        """
+        manifest = self.backfill_manifest('orders', start, end) if resume else None
+        self.backfill(self.write_orders_for_location, get_date_range(start, end), max_workers, manifest)
 
     def write_yesterday_labor(self) -> None:
         yesterday = dt.date.today() - dt.timedelta(days=1)
@@ -184,141 +252,266 @@ class ToastDataFlow(ToastConnector):
         start_date, end_date = get_start_and_end_of_last_week()
         self.write_labor_by_date_range(start_date, end_date)
 
-    def write_labor_by_date_range(self, start: dt.date, end: dt.date) -> None:
-        dates = get_date_range(start, end)
-        for date in dates:
-            self.write_labor_by_business_date(date)
+    def write_labor_by_date_range(self, start: dt.date, end: dt.date, max_workers: int = BACKFILL_MAX_WORKERS,
+                                  resume: bool = True) -> None:
+        """
+        Write the labor for every business date in the range, inclusive.
+        :param max_workers: number of (business date, location) units written concurrently. 1 is serial.
+        :param resume: skip units finished by an earlier failed run of the same range
+        """
+        manifest = self.backfill_manifest('labor', start, end) if resume else None
+        self.backfill(self.write_labor_for_location, get_date_range(start, end), max_workers, manifest)
+
+    def write_labor_for_location(self, business_date: int, location: dict[str, Any]) -> int:
+        """
+        Write one location's labor for a business date through its own batch writer.
+        :return: number of time entries written
+        """
+        data = self.get_labor_by_business_date(business_date, location['guid'])
+
+        location_id = self.location_indexes[location['guid']].location_id(business_date)
+
+        with self.batch_writer('labor') as batch:
+            for entry in data:
+                entry['location'] = location_id
+                entry['businessDate'] = int(entry['businessDate'])
+                batch.put_item(
+                    Item=entry
+                )
+        return len(data)
 
     def write_labor_by_business_date(self, business_date: int) -> None:
         print(f"Business Date: {date_int_to_dashed_string(business_date)}")
-        table = boto3.resource('dynamodb', region_name='us-east-1').Table('labor')
 
         for location in self.locations:
             if not location['info'][0]['address']:
                 continue
+            self.write_labor_for_location(business_date, location)
+
+    def backfill_manifest(self, table_name: str, start: dt.date, end: dt.date) -> BackfillManifest:
+        """Loaded progress manifest for a table and date range."""
+        key = f"{BACKFILL_MANIFEST_PREFIX}/{table_name}/{start.strftime('%Y%m%d')}_{end.strftime('%Y%m%d')}.json"
+        return S3BackfillManifest(S3_BUCKET, key).load()
+
+    def backfill(self, write_unit: Callable[[int, dict[str, Any]], int], dates: list[Union[str, int]],
+                 max_workers: int = BACKFILL_MAX_WORKERS, manifest: Union[BackfillManifest, None] = None) -> None:
+        """
+        Run a writer over every (business date, location) pair on a bounded worker pool.
+        :param write_unit: ie: write_orders_for_location, called as write_unit(business_date, location)
+        :param dates: business dates, YYYYMMDD
+        :param max_workers: number of units written concurrently. 1 is serial.
+        :param manifest: if given, finished units are skipped and each unit is recorded as it finishes.
+            The manifest is deleted once every unit is done.
+        """
+        units = [
+            (date, location) for date in dates for location in self.locations
+            if location['info'][0]['address']  # Ignore guid placeholders for future locations
+            and (manifest is None or not manifest.is_done(date, location['guid']))
+        ]
 
-            location_guid = location['guid']
-
-            data = self.get_labor_by_business_date(business_date, location_guid)
+        def run_unit(date: Union[str, int], location: dict[str, Any]) -> int:
+            count = write_unit(date, location)
+            if manifest is not None:
+                manifest.mark_done(date, location['guid'], count)
+            return count
+
+        if max_workers <= 1:
+            for date, location in units:
+                print(f"Business Date: {date_int_to_dashed_string(date)}, location: {location['info'][-1]['id']}")
+                run_unit(date, location)
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='backfill') as executor:
+                futures = {executor.submit(run_unit, date, location): (date, location) for date, location in units}
+                try:
+                    for future in as_completed(futures):
+                        date, location = futures[future]
+                        count = future.result()
+                        print(f"Business Date: {date_int_to_dashed_string(date)}, location: {location['info'][-1]['id']}, items: {count}")
+                except BaseException:
+                    # Stop on the first failure instead of writing every queued unit first, the manifest resumes the rest
+                    executor.shutdown(wait=True, cancel_futures=True)
+                    raise
+
+        if manifest is not None:
+            manifest.delete()
+        self.print_write_summary()
+        print('Done')
 
-            if len(location['info']) == 1:
-                location_id = location['info'][0]['id']
-            else:
-                location_id = location_id_from_date(location['info'], business_date)
+    def write_location_pages(self, table_name: str, iter_pages: Callable[[str], Iterator[list[dict[str, Any]]]],
+                             prepare: Callable[[dict[str, Any], dict[str, Any]], dict[str, Any]],
+                             digest_index: Union[DigestIndex, None] = None,
+                             watermarks: Union[WatermarkStore, None] = None,
+                             max_workers: int = LOCATIONS_MAX_WORKERS) -> None:
+        """
+        Write pages of records for every location to a table.
+        Locations run concurrently, so a run takes about as long as the slowest location. Within a location, pages are
+        fetched on a background thread through a bounded queue, so the next page is read from Toast while the previous
+        one is written to DynamoDB.
+        :param iter_pages: called with a location guid, yields pages of records
+        :param prepare: called with (record, location), returns the item to put
+        :param digest_index: if given, items unchanged since they were last written are skipped. Committed as each
+            location finishes and saved once at the end of the run, including when a location fails.
+        :param watermarks: if given, each location's watermark is advanced once its items are flushed
+        :param max_workers: number of locations written at once. 1 is serial.
+        """
+        def write_location(location: dict[str, Any]) -> int:
+            location_guid = location['guid']
+            count = 0
+            # One batch writer per location, so everything is flushed before its watermark moves. A guid can come back
+            # twice (ie: a newer copy from the next labor window), keep only the last so a batch never repeats a key.
+            with self.batch_writer(table_name, overwrite_by_pkeys=['guid']) as batch:
+                for page in iter_in_background(iter_pages(location_guid), maxsize=PIPELINE_QUEUE_PAGES):
+                    for record in page:
+                        item = prepare(record, location)
+                        if digest_index is not None and not digest_index.should_write(item, location_guid):
+                            continue
+                        batch.put_item(
+                            Item=item
+                        )
+                        count += 1
+                        if watermarks is not None:
+                            watermarks.observe(location_guid, item)
+
+            if digest_index is not None:
+                digest_index.commit(location_guid)
+            if watermarks is not None:
+                watermarks.advance(location_guid)
+            return count
+
+        locations = [location for location in self.locations if location['info'][0]['address']]
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=table_name) as executor:
+                futures = {executor.submit(write_location, location): location for location in locations}
+                for future in as_completed(futures):
+                    location = futures[future]
+                    count = future.result()
+                    print(f"Done with location: {location['info'][-1]['id']}, items: {count}")
+        finally:
+            # One upload of the whole index per run, with the digests of every location that finished. If the process
+            # dies first those records are just written again next run.
+            if digest_index is not None:
+                digest_index.save()
+
+        if digest_index is not None:
+            print(digest_index.summary())
+        self.print_write_summary()
+        print('Done')
 
-            with table.batch_writer() as batch:
-                for entry in data:
-                    entry['location'] = location_id
-                    entry['businessDate'] = int(entry['businessDate'])
-                    item = json.loads(json.dumps(entry), parse_float=Decimal)
-                    batch.put_item(
-                        Item=item
-                    )
+    def watermarks(self, entity: str, end: dt.datetime, adaptive: bool) -> WatermarkStore:
+        """Loaded per location watermarks for orders or labor."""
+        return S3WatermarkStore(S3_BUCKET, f'{WATERMARKS_PREFIX}/{entity}.json', end, adaptive).load()
 
-    def write_orders_between_times(self, start: dt.datetime, end: dt.datetime) -> None:
+    def write_orders_between_times(self, start: dt.datetime, end: dt.datetime, digest_index: Union[DigestIndex, None] = None,
+                                   watermarks: Union[WatermarkStore, None] = None) -> None:
+        """
+        :param start: start for every location, or only for those without a watermark when watermarks are given
+        :param watermarks: per location start times, advanced as each location finishes
+        """
 
-        table = boto3.resource('dynamodb', region_name='us-east-1').Table('orders')
+        def prepare(order: dict[str, Any], location: dict[str, Any]) -> dict[str, Any]:
+            location_id = self.location_indexes[location['guid']].location_id(order['businessDate'])
+            order['location'] = location_id
+            return order
 
-        for location in self.locations:
-            if not location['info'][0]['address']:
-                continue
-            location_guid = location['guid']
-            print("location: ", location['info'][-1]['id'])
-
-            data = self.get_orders_between_times(start, end, location_guid)
-            with table.batch_writer() as batch:
-                for order in data:
-                    if len(location['info']) == 1:
-                        location_id = location['info'][0]['id']
-                    else:
-                        location_id = location_id_from_date(location['info'], order['businessDate'])
-                    order['location'] = location_id
-                    item = json.loads(json.dumps(order), parse_float=Decimal)
-                    batch.put_item(
-                        Item=item
-                    )
-
-            print("Done with location: ", location['info'][-1]['id'])
-            print()
+        def iter_pages(location_guid: str) -> Iterator[list[dict[str, Any]]]:
+            location_start = watermarks.start(location_guid, start) if watermarks is not None else start
+            return self.iter_orders_between_times(location_start, end, location_guid, prefetch=ORDERS_PREFETCH)
 
-        print('Done')
+        self.write_location_pages('orders', iter_pages, prepare, digest_index, watermarks)
 
     def write_orders_to_now(self):
-        # Get the last updated time from S3
+        # Locations without a watermark yet start from the last global updated time
         start = dt.datetime.fromisoformat(read_from_s3(S3_BUCKET, 'last_updated_time_orders.txt')) - TIME_OVERLAP_BUFFER
         end = get_current_time_given_timezone()
 
-        # Write the orders between the last updated time and now
-        self.write_orders_between_times(start, end)
+        # Write the orders from each location's watermark to now, skipping anything unchanged since the last run
+        digest_index = self.digest_index('orders')
+        # The overlap can only adapt when unchanged orders are filtered out by the digest index
+        watermarks = self.watermarks('orders', end, adaptive=digest_index is not None)
+        self.write_orders_between_times(start, end, digest_index, watermarks)
 
         # Write the last updated time to S3
         write_to_s3(S3_BUCKET, 'last_updated_time_orders.txt', end.isoformat(timespec='milliseconds'))
 
-    def write_labor_between_times(self, start: dt.datetime, end: dt.datetime) -> None:
-        table = boto3.resource('dynamodb', region_name='us-east-1').Table('labor')
+        # Write the request metrics summary, if TOAST_METRICS_PATH is set
+        self.write_metrics()
 
-        for location in self.locations:
-            if not location['info'][0]['address']:
-                continue
+    def write_labor_between_times(self, start: dt.datetime, end: dt.datetime, digest_index: Union[DigestIndex, None] = None,
+                                  watermarks: Union[WatermarkStore, None] = None) -> None:
+        """
+        :param start: start for every location, or only for those without a watermark when watermarks are given
+        :param watermarks: per location start times, advanced as each location finishes
+        """
 
-            location_guid = location['guid']
-            print("location: ", location['info'][-1]['id'])
-
-            data = self.get_labor_between_times(start, end, location_guid)
-
-            with table.batch_writer() as batch:
-                for entry in data:
-                    if len(location['info']) == 1:
-                        location_id = location['info'][0]['id']
-                    else:
-                        location_id = location_id_from_date(location['info'], entry['businessDate'])
-                    entry['location'] = location_id
-                    entry['businessDate'] = int(entry['businessDate'])
-                    item = json.loads(json.dumps(entry), parse_float=Decimal)
-                    batch.put_item(
-                        Item=item
-                    )
-
-            print("Done with location: ", location['info'][-1]['id'])
-            print()
+        def prepare(entry: dict[str, Any], location: dict[str, Any]) -> dict[str, Any]:
+            location_id = self.location_indexes[location['guid']].location_id(entry['businessDate'])
+            entry['location'] = location_id
+            entry['businessDate'] = int(entry['businessDate'])
+            return entry
 
-        print('Done')
+        def iter_pages(location_guid: str) -> Iterator[list[dict[str, Any]]]:
+            location_start = watermarks.start(location_guid, start) if watermarks is not None else start
+            return self.iter_labor_between_times(location_start, end, location_guid)
+
+        self.write_location_pages('labor', iter_pages, prepare, digest_index, watermarks)
 
     def write_labor_to_now(self):
-        # Get the last updated time from S3
+        # Locations without a watermark yet start from the last global updated time
         start = dt.datetime.fromisoformat(read_from_s3(S3_BUCKET, 'last_updated_time_labor.txt')) - TIME_OVERLAP_BUFFER
         end = get_current_time_given_timezone()
 
-        # Write the labor between the last updated time and now
-        self.write_labor_between_times(start, end)
+        # Write the labor from each location's watermark to now, skipping anything unchanged since the last run
+        digest_index = self.digest_index('labor')
+        # The overlap can only adapt when unchanged entries are filtered out by the digest index
+        watermarks = self.watermarks('labor', end, adaptive=digest_index is not None)
+        self.write_labor_between_times(start, end, digest_index, watermarks)
 
         # Write the last updated time to S3
         write_to_s3(S3_BUCKET, 'last_updated_time_labor.txt', end.isoformat(timespec='milliseconds'))
 
+        # Write the request metrics summary, if TOAST_METRICS_PATH is set
+        self.write_metrics()
+
+    def update_mapping(self, mapping: str, _type: str, start: str, max_workers: int = MAPPINGS_MAX_WORKERS) -> None:
+        """
+        Refresh one mapping table, fetching every location concurrently and writing through the table's own writer.
+        :param mapping: ie: 'employees'
+        :param _type: 'config' or 'labor'
+        :param start: ISO time, config mappings modified since then are fetched
+        """
+        def fetch(location: dict[str, Any]) -> list[dict[str, Any]]:
+            if _type == 'config':
+                return self.get_config_mappings(mapping, location['guid'], start)
+            elif _type == 'labor':
+                return self.get_labor_mappings(mapping, location['guid'])
+
+        locations = [location for location in self.locations if location['info'][0]['address']]
+
+        # Mappings shared by several locations come back once per location, drop the copies as they arrive
+        deduper = StreamingDeduper()
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=mapping) as executor:
+            with self.batch_writer(mapping) as batch:
+                for response in executor.map(fetch, locations):
+                    for item in deduper.filter(response):
+                        if item['guid'] is not None:
+                            batch.put_item(
+                                Item=item
+                            )
+        print("Done with mapping: ", mapping)
+
     def update_mappings(self):
         start = (dt.datetime.fromisoformat(read_from_s3(S3_BUCKET, 'last_updated_time_mappings.txt')) - \
                  dt.timedelta(days=3)).isoformat(timespec='milliseconds')
         # start = "2021-01-01T00:00:00.000+0000"
 
-        for mapping, _type in [('dining_options', 'config'), ('alternate_payments', 'config'), ('employees', 'labor'), ('jobs', 'labor')]:
-            table = boto3.resource('dynamodb', region_name='us-east-1').Table(mapping)
-            data = []
-            for location in self.locations:
-                if not location['info'][0]['address']:
-                    continue
-                if _type == 'config':
-                    response = self.get_config_mappings(mapping, location['guid'], start)
-                elif _type == 'labor':
-                    response = self.get_labor_mappings(mapping, location['guid'])
-                data += response
-
-            data = remove_duplicates(data)
-            with table.batch_writer() as batch:
-                for item in data:
-                    if item['guid'] is not None:
-                        batch.put_item(
-                            Item=json.loads(json.dumps(item), parse_float=Decimal)
-                        )
+        # Every mapping table is refreshed at once, each with its own writer
+        mappings = [('dining_options', 'config'), ('alternate_payments', 'config'), ('employees', 'labor'), ('jobs', 'labor')]
+        with ThreadPoolExecutor(max_workers=len(mappings), thread_name_prefix='mappings') as executor:
+            futures = [executor.submit(self.update_mapping, mapping, _type, start) for mapping, _type in mappings]
+            for future in futures:
+                future.result()
+        self.print_write_summary()
+
         now = get_current_time_given_timezone()
         write_to_s3(
             S3_BUCKET,
@@ -1,20 +1,40 @@
 import datetime as dt
 from zoneinfo import ZoneInfo
 import calendar
+import threading
 
 from ziki_helpers.aws.dynamodb import get_entire_table
 from ziki_helpers.aws.s3 import read_from_s3, write_to_s3
-from ziki_helpers.spark.create import get_spark_for_delta_s3
 from ziki_helpers.toast_api.connector import ToastConnector
-from ziki_helpers.delta_lake.delta_lake import upsert
 
-from ziki_helpers.toast_data.menu_items import preprocess_menu_items
+# Spark, Delta and the Spark preprocessing are imported on first use, see get_spark
 
 # Stores the last time orders were written to DynamoDB
 DATAFLOW_CONFIG_S3_BUCKET = 'ziki-dataflow'
 DATABASE_S3_BUCKET = 'toast-delta-tables'
 
-spark = get_spark_for_delta_s3()
+_spark = None
+_spark_lock = threading.Lock()
+
+
+def get_spark():
+    """
+    Spark session for the Delta Lake writers, started on first use and reused after.
+    Starting it means a JVM and resolving the Delta / S3 packages, so importing this module doesn't do it.
+    """
+    global _spark
+    with _spark_lock:
+        if _spark is None:
+            from ziki_helpers.spark.create import get_spark_for_delta_s3
+            _spark = get_spark_for_delta_s3()
+        return _spark
+
+
+def set_spark(spark) -> None:
+    """Use an existing Spark session (ie: a notebook's or a test's) instead of starting one."""
+    global _spark
+    with _spark_lock:
+        _spark = spark
 
 
 # This is the amount of time overlapped for writing entries by time.
@@ -41,28 +61,6 @@ def get_date_range(start_date: dt.date, end_date: dt.date) -> list[str]:
     return date_range
 
 
-def to_hashable(obj):
-    """Recursively convert a JSON object to a hashable representation."""
-    if isinstance(obj, list):
-        return tuple(to_hashable(item) for item in obj)
-    elif isinstance(obj, dict):
-        return tuple((key, to_hashable(value)) for key, value in obj.items())
-    else:
-        return obj
-
-
-def remove_duplicates(json_list: list[dict]) -> list[dict]:
-    """Remove duplicates from a list of JSON dictionaries."""
-    seen = set()
-    unique = []
-    for json_dict in json_list:
-        hashable_dict = to_hashable(json_dict)
-        if hashable_dict not in seen:
-            seen.add(hashable_dict)
-            unique.append(json_dict)
-    return unique
-
-
 def date_int_to_dashed_string(date: int) -> str:
     """
     Convert a date in integer form (YYYYMMDD) to a dashed string (YYYY-MM-DD).
@@ -113,8 +111,13 @@ def get_start_and_end_of_last_week() -> tuple[dt.date, dt.date]:
 
 class ToastDataPipeline(ToastConnector):
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, spark=None, **connector_kwargs):
+        """
+        :param spark: Spark session to use, defaults to the shared one from get_spark, started when first needed
+        :param connector_kwargs: passed to ToastConnector
+        """
+        super().__init__(**connector_kwargs)
+        self._spark = spark
         self.locations = get_entire_table('locations')
 
         # Change location ids to integers
@@ -130,6 +133,12 @@ class ToastDataPipeline(ToastConnector):
             } for location in self.locations
         ]
 
+    @property
+    def spark(self):
+        if self._spark is None:
+            self._spark = get_spark()
+        return self._spark
+
     def write_menu_items_to_now(self) -> None:
         start = dt.datetime.fromisoformat(read_from_s3(DATAFLOW_CONFIG_S3_BUCKET, 'last_updated_time_menu_items.txt')) - TIME_OVERLAP_BUFFER
         # start = dt.datetime(2015, 12, 1)  # Earliest date
@@ -143,12 +152,15 @@ class ToastDataPipeline(ToastConnector):
 
             data += self.get_menu_items_by_after_datetime(start, location_guid)
 
+        from ziki_helpers.delta_lake.delta_lake import upsert
+        from ziki_helpers.toast_data.menu_items import preprocess_menu_items
+
         # Preprocess the data to spark dataframe
-        df = preprocess_menu_items(data, spark)
+        df = preprocess_menu_items(data, self.spark)
 
         # Write the data to delta lake
         table_path = f's3://{DATABASE_S3_BUCKET}/menu_items'
-        upsert(df, table_path, spark, key_col='guid')
+        upsert(df, table_path, self.spark, key_col='guid')
 
         # Write the last updated time to S3
         now = get_current_time_given_timezone()
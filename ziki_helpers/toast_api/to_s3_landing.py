@@ -1,21 +1,31 @@
 import datetime as dt
 from zoneinfo import ZoneInfo
 import calendar
+from typing import Any, Callable, Iterable, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from ziki_helpers.aws.dynamodb import get_entire_table
-from ziki_helpers.aws.s3 import read_from_s3, write_to_s3
-from ziki_helpers.spark.create import get_spark_for_delta_s3
+from ziki_helpers.aws.s3 import read_from_s3
 from ziki_helpers.toast_api.connector import ToastConnector
-from ziki_helpers.delta_lake.delta_lake import upsert
-
-from ziki_helpers.toast_data.menu_items import preprocess_menu_items
+from ziki_helpers.toast_api.async_connector import DEFAULT_MAX_CONCURRENCY
+from ziki_helpers.toast_api.landing_writer import PartitionedLandingWriter
+from ziki_helpers.toast_api.location_index import build_location_indexes
+from ziki_helpers.toast_api.watermarks import WatermarkStore, S3WatermarkStore
 
 # Stores the last time orders were written to DynamoDB
 DATAFLOW_CONFIG_S3_BUCKET = 'ziki-dataflow'
 DATABASE_S3_BUCKET = 'toast-delta-tables'
 LANDING_S3_BUCKET = 'toast-api-landing'
-
-# spark = get_spark_for_delta_s3()
+# Compression of the NDJSON landing files, 'gzip', 'zstd' (needs zstandard) or None
+LANDING_COMPRESSION = 'gzip'
+# Where the per location watermarks of the landing *_to_now writers are kept in DATAFLOW_CONFIG_S3_BUCKET
+LANDING_WATERMARKS_PREFIX = 'landing_watermarks'
+# How far back a location without a landing watermark starts, older data comes from the date range writers
+LANDING_INITIAL_LOOKBACK = dt.timedelta(days=1)
+# Pages of orders requested ahead once a location has a full page
+ORDERS_PREFETCH = 4
+# Number of locations landed at once by the between times writers
+LOCATIONS_MAX_WORKERS = DEFAULT_MAX_CONCURRENCY
 
 
 # This is the amount of time overlapped for writing entries by time.
@@ -42,28 +52,6 @@ def get_date_range(start_date: dt.date, end_date: dt.date) -> list[str]:
     return date_range
 
 
-def to_hashable(obj):
-    """Recursively convert a JSON object to a hashable representation."""
-    if isinstance(obj, list):
-        return tuple(to_hashable(item) for item in obj)
-    elif isinstance(obj, dict):
-        return tuple((key, to_hashable(value)) for key, value in obj.items())
-    else:
-        return obj
-
-
-def remove_duplicates(json_list: list[dict]) -> list[dict]:
-    """Remove duplicates from a list of JSON dictionaries."""
-    seen = set()
-    unique = []
-    for json_dict in json_list:
-        hashable_dict = to_hashable(json_dict)
-        if hashable_dict not in seen:
-            seen.add(hashable_dict)
-            unique.append(json_dict)
-    return unique
-
-
 def date_int_to_dashed_string(date: int) -> str:
     """
     Convert a date in integer form (YYYYMMDD) to a dashed string (YYYY-MM-DD).
@@ -114,8 +102,8 @@ def get_start_and_end_of_last_week() -> tuple[dt.date, dt.date]:
 
 class ToastS3DataPipeline(ToastConnector):
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, **connector_kwargs):
+        super().__init__(**connector_kwargs)
         self.locations = get_entire_table('locations')
 
         # Change location ids to integers
@@ -130,229 +118,172 @@ class ToastS3DataPipeline(ToastConnector):
                 ]
             } for location in self.locations
         ]
+        # Business date -> location id lookups, for guids shared by several location ids over time
+        self.location_indexes = build_location_indexes(self.locations)
 
     def write_menu_items_to_now(self) -> None:
         start = dt.datetime.fromisoformat(read_from_s3(DATAFLOW_CONFIG_S3_BUCKET, 'last_updated_time_menu_items.txt')) - TIME_OVERLAP_BUFFER
         # start = dt.datetime(2015, 12, 1)  # Earliest date
-        # Write the menu items since the last updated time
-        data = []
+        # Stream the menu items since the last updated time to S3, partitioned by location and landing date
+        now = get_current_time_given_timezone()
+        unique_str = now.strftime('%Y%m%d%H%M%S')
+        with PartitionedLandingWriter(LANDING_S3_BUCKET, 'menu_items', unique_str, LANDING_COMPRESSION) as writer:
+            for location in self.locations:
+                if not location['info'][0]['address']:
+                    continue
+
+                location_guid = location['guid']
+                location_id = location['info'][-1]['id']
+
+                for page in self.iter_menu_items_by_after_datetime(start, location_guid):
+                    for item in page:
+                        writer.write(item, location_id, now.date())
+
+        print('Landed menu items: ', writer.records)
+
+        # Write the last updated time to S3
+        # now = get_current_time_given_timezone()
+        # write_to_s3(DATAFLOW_CONFIG_S3_BUCKET, 'last_updated_time_menu_items.txt', now.isoformat(timespec='milliseconds'))
+
+        # Write the request metrics summary, if TOAST_METRICS_PATH is set
+        self.write_metrics()
+
+    def run_id(self, *parts: Any) -> str:
+        """Unique name for one landing run, ie: the orders for one location and business date."""
+        return '_'.join([str(part) for part in parts] + [get_current_time_given_timezone().strftime('%Y%m%d%H%M%S')])
+
+    def land_location_pages(self, entity: str, location: dict[str, Any], pages: Iterable[list[dict[str, Any]]], run_id: str) -> int:
+        """
+        Land one location's pages of orders or time entries, partitioned by location id and business date.
+        Objects and the manifest are only complete once this returns.
+        :return: number of records landed
+        """
+        index = self.location_indexes[location['guid']]
+        with PartitionedLandingWriter(LANDING_S3_BUCKET, entity, run_id, LANDING_COMPRESSION) as writer:
+            for page in pages:
+                for record in page:
+                    location_id = index.location_id(record['businessDate'])
+                    record['location'] = location_id
+                    writer.write(record, location_id, date_int_to_dashed_string(record['businessDate']))
+        return writer.records
+
+    def write_orders_by_business_date(self, business_date: int) -> None:
+        print(f"Business Date: {date_int_to_dashed_string(business_date)}")
+
         for location in self.locations:
-            if not location['info'][0]['address']:
+            if not location['info'][0]['address']:  # Ignore guid placeholders for future locations
                 continue
+            pages = self.iter_orders_by_business_date(business_date, location['guid'], prefetch=ORDERS_PREFETCH)
+            self.land_location_pages('orders', location, pages, self.run_id(business_date, location['info'][-1]['id']))
+        print('Done')
 
-            location_guid = location['guid']
+    def write_yesterday_orders(self):
+        yesterday = dt.date.today() - dt.timedelta(days=1)
+        business_date = int(yesterday.strftime('%Y%m%d'))
+        self.write_orders_by_business_date(business_date)
 
-            data += self.get_menu_items_by_after_datetime(start, location['guid'])
+    def write_last_month_orders(self) -> None:
+        start_date, end_date = get_start_and_end_of_last_month()
+        self.write_orders_by_date_range(start_date, end_date)
 
-        # Write the data to S3
-        unique_str = get_current_time_given_timezone().strftime('%Y%m%d%H%M%S')
-        file_name = f'menu_items/{unique_str}.json'
+    def write_last_week_orders(self) -> None:
+        start_date, end_date = get_start_and_end_of_last_week()
+        self.write_orders_by_date_range(start_date, end_date)
 
-        write_to_s3(
-            bucket_name=LANDING_S3_BUCKET,
-            file_name=file_name,
-            data=data,
+    def write_orders_by_date_range(self, start: dt.date, end: dt.date) -> None:
+        dates = get_date_range(start, end)
+        for date in dates:
+            self.write_orders_by_business_date(date)
+
+    def write_yesterday_labor(self) -> None:
+        yesterday = dt.date.today() - dt.timedelta(days=1)
+        business_date = int(yesterday.strftime('%Y%m%d'))
+
+        self.write_labor_by_business_date(business_date)
+
+    def write_last_month_labor(self) -> None:
+        start_date, end_date = get_start_and_end_of_last_month()
+        self.write_labor_by_date_range(start_date, end_date)
+
+    def write_last_week_labor(self) -> None:
+        start_date, end_date = get_start_and_end_of_last_week()
+        self.write_labor_by_date_range(start_date, end_date)
+
+    def write_labor_by_date_range(self, start: dt.date, end: dt.date) -> None:
+        dates = get_date_range(start, end)
+        for date in dates:
+            self.write_labor_by_business_date(date)
+
+    def write_labor_by_business_date(self, business_date: int) -> None:
+        print(f"Business Date: {date_int_to_dashed_string(business_date)}")
+
+        for location in self.locations:
+            if not location['info'][0]['address']:
+                continue
+            data = self.get_labor_by_business_date(business_date, location['guid'])
+            self.land_location_pages('labor', location, [data], self.run_id(business_date, location['info'][-1]['id']))
+        print('Done')
+
+    def watermarks(self, entity: str, end: dt.datetime) -> WatermarkStore:
+        """Loaded per location landing watermarks for orders or labor, separate from the DynamoDB ones."""
+        return S3WatermarkStore(DATAFLOW_CONFIG_S3_BUCKET, f'{LANDING_WATERMARKS_PREFIX}/{entity}.json', end).load()
+
+    def write_between_times(self, entity: str, iter_pages: Callable[[dt.datetime, dt.datetime, str], Iterable[list[dict[str, Any]]]],
+                            start: dt.datetime, end: dt.datetime, watermarks: Union[WatermarkStore, None] = None,
+                            max_workers: int = LOCATIONS_MAX_WORKERS) -> None:
+        """
+        Land every location's records modified between two times, several locations at once.
+        :param iter_pages: called with (start, end, location guid), yields pages of records
+        :param start: start for every location, or only for those without a watermark when watermarks are given
+        :param watermarks: per location start times, advanced once each location's objects are complete
+        :param max_workers: number of locations landed at once. 1 is serial.
+        """
+        def land_location(location: dict[str, Any]) -> int:
+            location_guid = location['guid']
+            location_start = watermarks.start(location_guid, start) if watermarks is not None else start
+            pages = iter_pages(location_start, end, location_guid)
+            count = self.land_location_pages(entity, location, pages, self.run_id(location['info'][-1]['id']))
+            if watermarks is not None:
+                watermarks.advance(location_guid)
+            return count
+
+        locations = [location for location in self.locations if location['info'][0]['address']]
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=entity) as executor:
+            futures = {executor.submit(land_location, location): location for location in locations}
+            for future in as_completed(futures):
+                location = futures[future]
+                count = future.result()
+                print(f"Done with location: {location['info'][-1]['id']}, records: {count}")
+
+        print('Done')
+
+    def write_orders_between_times(self, start: dt.datetime, end: dt.datetime, watermarks: Union[WatermarkStore, None] = None) -> None:
+        self.write_between_times(
+            'orders',
+            lambda location_start, location_end, location_guid: self.iter_orders_between_times(
+                location_start, location_end, location_guid, prefetch=ORDERS_PREFETCH
+            ),
+            start, end, watermarks,
         )
 
-        # Write the last updated time to S3
-        # now = get_current_time_given_timezone()
-        # write_to_s3(DATAFLOW_CONFIG_S3_BUCKET, 'last_updated_time_menu_items.txt', now.isoformat(timespec='milliseconds'))
+    def write_orders_to_now(self):
+        # Land each location's orders from its watermark to now, new locations start LANDING_INITIAL_LOOKBACK back
+        end = get_current_time_given_timezone()
+        self.write_orders_between_times(end - LANDING_INITIAL_LOOKBACK, end, self.watermarks('orders', end))
+
+        # Write the request metrics summary, if TOAST_METRICS_PATH is set
+        self.write_metrics()
+
+    def write_labor_between_times(self, start: dt.datetime, end: dt.datetime, watermarks: Union[WatermarkStore, None] = None) -> None:
+        self.write_between_times('labor', self.iter_labor_between_times, start, end, watermarks)
+
+    def write_labor_to_now(self):
+        # Land each location's labor from its watermark to now, new locations start LANDING_INITIAL_LOOKBACK back
+        end = get_current_time_given_timezone()
+        self.write_labor_between_times(end - LANDING_INITIAL_LOOKBACK, end, self.watermarks('labor', end))
 
-    # TODO: Refactor everything below
-    # def write_orders_by_business_date(self, business_date: int) -> None:
-    #     print(f"Business Date: {date_int_to_dashed_string(business_date)}")
-    #
-    #     table = boto3.resource('dynamodb', region_name='us-east-1').Table('orders')
-    #     with table.batch_writer() as batch:
-    #         for location in self.locations:
-    #             if not location['info'][0]['address']:  # Ignore guid placeholders for future locations
-    #                 continue
-    #             if len(location['info']) == 1:
-    #                 location_id = location['info'][0]['id']
-    #             else:
-    #                 location_id = location_id_from_date(location['info'], business_date)
-    #             data = self.get_orders_by_business_date(business_date, location['guid'])
-    #             for order in data:
-    #                 order['location'] = location_id
-    #                 item = json.loads(json.dumps(order), parse_float=Decimal)
-    #                 batch.put_item(
-    #                     Item=item
-    #                 )
-    #     print('Done')
-    #
-    # def write_yesterday_orders(self):
-    #     yesterday = dt.date.today() - dt.timedelta(days=1)
-    #     business_date = int(yesterday.strftime('%Y%m%d'))
-    #     self.write_orders_by_business_date(business_date)
-    #
-    # def write_last_month_orders(self) -> None:
-    #     start_date, end_date = get_start_and_end_of_last_month()
-    #     self.write_orders_by_date_range(start_date, end_date)
-    #
-    # def write_last_week_orders(self) -> None:
-    #     start_date, end_date = get_start_and_end_of_last_week()
-    #     self.write_orders_by_date_range(start_date, end_date)
-    #
-    # def write_orders_by_date_range(self, start: dt.date, end: dt.date) -> None:
-    #     dates = get_date_range(start, end)
-    #     for date in dates:
-    #         self.write_orders_by_business_date(date)
-    #
-    # def write_yesterday_labor(self) -> None:
-    #     yesterday = dt.date.today() - dt.timedelta(days=1)
-    #     business_date = int(yesterday.strftime('%Y%m%d'))
-    #
-    #     self.write_labor_by_business_date(business_date)
-    #
-    # def write_last_month_labor(self) -> None:
-    #     start_date, end_date = get_start_and_end_of_last_month()
-    #     self.write_labor_by_date_range(start_date, end_date)
-    #
-    # def write_last_week_labor(self) -> None:
-    #     start_date, end_date = get_start_and_end_of_last_week()
-    #     self.write_labor_by_date_range(start_date, end_date)
-    #
-    # def write_labor_by_date_range(self, start: dt.date, end: dt.date) -> None:
-    #     dates = get_date_range(start, end)
-    #     for date in dates:
-    #         self.write_labor_by_business_date(date)
-    #
-    # def write_labor_by_business_date(self, business_date: int) -> None:
-    #     print(f"Business Date: {date_int_to_dashed_string(business_date)}")
-    #     table = boto3.resource('dynamodb', region_name='us-east-1').Table('labor')
-    #
-    #     for location in self.locations:
-    #         if not location['info'][0]['address']:
-    #             continue
-    #
-    #         location_guid = location['guid']
-    #
-    #         data = self.get_labor_by_business_date(business_date, location_guid)
-    #
-    #         if len(location['info']) == 1:
-    #             location_id = location['info'][0]['id']
-    #         else:
-    #             location_id = location_id_from_date(location['info'], business_date)
-    #
-    #         with table.batch_writer() as batch:
-    #             for entry in data:
-    #                 entry['location'] = location_id
-    #                 entry['businessDate'] = int(entry['businessDate'])
-    #                 item = json.loads(json.dumps(entry), parse_float=Decimal)
-    #                 batch.put_item(
-    #                     Item=item
-    #                 )
-    #
-    # def write_orders_between_times(self, start: dt.datetime, end: dt.datetime) -> None:
-    #
-    #     table = boto3.resource('dynamodb', region_name='us-east-1').Table('orders')
-    #
-    #     for location in self.locations:
-    #         if not location['info'][0]['address']:
-    #             continue
-    #         location_guid = location['guid']
-    #         print("location: ", location['info'][-1]['id'])
-    #
-    #         data = self.get_orders_between_times(start, end, location_guid)
-    #         with table.batch_writer() as batch:
-    #             for order in data:
-    #                 if len(location['info']) == 1:
-    #                     location_id = location['info'][0]['id']
-    #                 else:
-    #                     location_id = location_id_from_date(location['info'], order['businessDate'])
-    #                 order['location'] = location_id
-    #                 item = json.loads(json.dumps(order), parse_float=Decimal)
-    #                 batch.put_item(
-    #                     Item=item
-    #                 )
-    #
-    #         print("Done with location: ", location['info'][-1]['id'])
-    #         print()
-    #
-    #     print('Done')
-    #
-    # def write_orders_to_now(self):
-    #     # Get the last updated time from S3
-    #     start = dt.datetime.fromisoformat(read_from_s3(DATAFLOW_CONFIG_S3_BUCKET, 'last_updated_time_orders.txt')) - TIME_OVERLAP_BUFFER
-    #     end = get_current_time_given_timezone()
-    #
-    #     # Write the orders between the last updated time and now
-    #     self.write_orders_between_times(start, end)
-    #
-    #     # Write the last updated time to S3
-    #     write_to_s3(DATAFLOW_CONFIG_S3_BUCKET, 'last_updated_time_orders.txt', end.isoformat(timespec='milliseconds'))
-    #
-    # def write_labor_between_times(self, start: dt.datetime, end: dt.datetime) -> None:
-    #     table = boto3.resource('dynamodb', region_name='us-east-1').Table('labor')
-    #
-    #     for location in self.locations:
-    #         if not location['info'][0]['address']:
-    #             continue
-    #
-    #         location_guid = location['guid']
-    #         print("location: ", location['info'][-1]['id'])
-    #
-    #         data = self.get_labor_between_times(start, end, location_guid)
-    #
-    #         with table.batch_writer() as batch:
-    #             for entry in data:
-    #                 if len(location['info']) == 1:
-    #                     location_id = location['info'][0]['id']
-    #                 else:
-    #                     location_id = location_id_from_date(location['info'], entry['businessDate'])
-    #                 entry['location'] = location_id
-    #                 entry['businessDate'] = int(entry['businessDate'])
-    #                 item = json.loads(json.dumps(entry), parse_float=Decimal)
-    #                 batch.put_item(
-    #                     Item=item
-    #                 )
-    #
-    #         print("Done with location: ", location['info'][-1]['id'])
-    #         print()
-    #
-    #     print('Done')
-    #
-    # def write_labor_to_now(self):
-    #     # Get the last updated time from S3
-    #     start = dt.datetime.fromisoformat(read_from_s3(DATAFLOW_CONFIG_S3_BUCKET, 'last_updated_time_labor.txt')) - TIME_OVERLAP_BUFFER
-    #     end = get_current_time_given_timezone()
-    #
-    #     # Write the labor between the last updated time and now
-    #     self.write_labor_between_times(start, end)
-    #
-    #     # Write the last updated time to S3
-    #     write_to_s3(DATAFLOW_CONFIG_S3_BUCKET, 'last_updated_time_labor.txt', end.isoformat(timespec='milliseconds'))
-    #
-    # def update_mappings(self):
-    #     start = (dt.datetime.fromisoformat(read_from_s3(DATAFLOW_CONFIG_S3_BUCKET, 'last_updated_time_mappings.txt')) - \
-    #              dt.timedelta(days=3)).isoformat(timespec='milliseconds')
-    #     # start = "2021-01-01T00:00:00.000+0000"
-    #
-    #     for mapping, _type in [('dining_options', 'config'), ('alternate_payments', 'config'), ('employees', 'labor'), ('jobs', 'labor')]:
-    #         table = boto3.resource('dynamodb', region_name='us-east-1').Table(mapping)
-    #         data = []
-    #         for location in self.locations:
-    #             if not location['info'][0]['address']:
-    #                 continue
-    #             if _type == 'config':
-    #                 response = self.get_config_mappings(mapping, location['guid'], start)
-    #             elif _type == 'labor':
-    #                 response = self.get_labor_mappings(mapping, location['guid'])
-    #             data += response
-    #
-    #         data = remove_duplicates(data)
-    #         with table.batch_writer() as batch:
-    #             for item in data:
-    #                 if item['guid'] is not None:
-    #                     batch.put_item(
-    #                         Item=json.loads(json.dumps(item), parse_float=Decimal)
-    #                     )
-    #     now = get_current_time_given_timezone()
-    #     write_to_s3(
-    #         DATAFLOW_CONFIG_S3_BUCKET,
-    #         'last_updated_time_mappings.txt',
-    #         now.isoformat(timespec='milliseconds')
-    #     )
+        # Write the request metrics summary, if TOAST_METRICS_PATH is set
+        self.write_metrics()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,107 @@
+import threading
+import datetime as dt
+from typing import Any, Union
+
+from ziki_helpers.toast_api.json_store import JSONStore, LocalJSONStore, S3JSONStore
+
+# Overlap used for a location until it has history, same as the old global buffer
+DEFAULT_OVERLAP = dt.timedelta(hours=4)
+# Bounds for the adaptive overlap. Records modified more than the current overlap before the watermark are never
+# fetched by the *_to_now writers, so keep the floor well above how late Toast records are known to show up.
+MIN_OVERLAP = dt.timedelta(hours=2)
+MAX_OVERLAP = dt.timedelta(hours=12)
+# Overlap kept above the latest late modification seen
+OVERLAP_SAFETY_FACTOR = 2.0
+# Overlap shrinks by this factor after a run without late modifications
+OVERLAP_DECAY = 0.75
+
+
+class WatermarkStore:
+    """
+    Per location watermarks for one entity (ie: orders or labor).
+
+    Each location keeps the end time of its last successful run and its own overlap, so a run starts at
+    watermark - overlap for every location and a failed location doesn't hold the others back.
+
+    With `adaptive` on, the overlap follows what's observed: records written with a modifiedDate before the previous
+    watermark arrived late, so the overlap grows to cover them (times OVERLAP_SAFETY_FACTOR). Runs without late
+    records shrink it by OVERLAP_DECAY, down to MIN_OVERLAP. Only records inside the current overlap can be observed,
+    anything modified earlier than that is missed without a trace (the daily business date writers pick it up).
+
+    Only turn it on when unchanged records are filtered out before observe (ie: by a DigestIndex), otherwise every
+    record in the overlap looks late. Commit the digest index before each advance, so records written before a failed
+    run are still recognised as unchanged and not counted as late.
+    """
+
+    def __init__(self, store: JSONStore, run_end: dt.datetime, adaptive: bool = False):
+        self.store = store
+        self.run_end = run_end
+        self.adaptive = adaptive
+        self.locations = dict()  # location guid -> {'watermark', 'overlapSeconds', 'updatedAt'}
+        self.lateness = dict()  # location guid -> latest late modification seen this run, seconds
+        # Locations can finish on different threads
+        self.lock = threading.Lock()
+
+    def load(self) -> 'WatermarkStore':
+        self.locations = self.store.load() or dict()
+        return self
+
+    def watermark(self, location_guid: str) -> Union[dt.datetime, None]:
+        entry = self.locations.get(location_guid)
+        return dt.datetime.fromisoformat(entry['watermark']) if entry is not None else None
+
+    def overlap(self, location_guid: str) -> dt.timedelta:
+        entry = self.locations.get(location_guid)
+        return dt.timedelta(seconds=entry['overlapSeconds']) if entry is not None else DEFAULT_OVERLAP
+
+    def start(self, location_guid: str, default: dt.datetime) -> dt.datetime:
+        """
+        Where this run should start for a location.
+        :param default: start for locations without a watermark yet
+        """
+        watermark = self.watermark(location_guid)
+        if watermark is None:
+            return default
+        return watermark - self.overlap(location_guid)
+
+    def observe(self, location_guid: str, record: dict[str, Any]) -> None:
+        """Note a written record, tracking how late it arrived relative to the previous watermark."""
+        if not self.adaptive or not record.get('modifiedDate'):
+            return
+        watermark = self.watermark(location_guid)
+        if watermark is None:
+            return
+        late_seconds = (watermark - dt.datetime.fromisoformat(record['modifiedDate'])).total_seconds()
+        with self.lock:
+            if late_seconds > self.lateness.get(location_guid, 0):
+                self.lateness[location_guid] = late_seconds
+
+    def advance(self, location_guid: str) -> None:
+        """Move a location's watermark to the end of this run, adapting its overlap, and persist the store."""
+        with self.lock:
+            overlap = self.overlap(location_guid)
+            if self.adaptive and location_guid in self.locations:
+                late = dt.timedelta(seconds=self.lateness.get(location_guid, 0) * OVERLAP_SAFETY_FACTOR)
+                overlap = min(MAX_OVERLAP, max(MIN_OVERLAP, late, overlap * OVERLAP_DECAY))
+
+            self.locations[location_guid] = {
+                'watermark': self.run_end.isoformat(timespec='milliseconds'),
+                'overlapSeconds': overlap.total_seconds(),
+                'updatedAt': dt.datetime.now(dt.timezone.utc).isoformat(timespec='milliseconds'),
+            }
+            # Written under the lock so an older snapshot never overwrites a newer one
+            self.store.save(self.locations)
+
+
+class LocalWatermarkStore(WatermarkStore):
+    """Watermarks in a JSON file on local disk."""
+
+    def __init__(self, path: str, run_end: dt.datetime, adaptive: bool = False):
+        super().__init__(LocalJSONStore(path, indent=2), run_end, adaptive)
+
+
+class S3WatermarkStore(WatermarkStore):
+    """Watermarks in S3, shared by every machine running the data flow."""
+
+    def __init__(self, bucket_name: str, key: str, run_end: dt.datetime, adaptive: bool = False):
+        super().__init__(S3JSONStore(bucket_name, key, indent=2), run_end, adaptive)
@@ -1,41 +1,64 @@
-from typing import Any
+from typing import Any, TYPE_CHECKING
 
-import pyspark
-from pyspark.sql.types import StructType, StructField, StringType, ArrayType, MapType
-from pyspark.sql.functions import explode, expr
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 
+if TYPE_CHECKING:
+    import pyspark
 
-def preprocess_menu_items(data: list[dict[Any]], spark: pyspark.sql.session.SparkSession) -> pyspark.sql.DataFrame:
-    schema = StructType([
-        StructField("guid", StringType(), nullable=True),
-        StructField("visibility", StringType(), nullable=True),
-        StructField("optionGroups", ArrayType(MapType(StringType(), StringType())), nullable=True),
-        StructField("orderableOnline", StringType(), nullable=True),
-        StructField("name", StringType(), nullable=True),
-    ])
-    rdd = spark.sparkContext.parallelize(data)
+# Raw menu item fields we keep, option groups only need their guid
+MENU_ITEMS_ARROW_SCHEMA = pa.schema([
+    pa.field('guid', pa.string()),
+    pa.field('visibility', pa.string()),
+    pa.field('optionGroups', pa.list_(pa.struct([pa.field('guid', pa.string())]))),
+    pa.field('orderableOnline', pa.string()),
+    pa.field('name', pa.string()),
+])
 
-    df = spark.createDataFrame(rdd, schema=schema)
+# Spark schema of menu_items_to_arrow's output, as DDL so this module imports without pyspark
+MENU_ITEMS_SCHEMA = 'guid string, visibility string, orderableOnline string, name string, optionGroupGuids array<string>'
+
+
+def menu_items_to_arrow(data: list[dict[Any]]) -> pa.Table:
+    """
+    Raw menu items to an Arrow table, with optionGroups reduced to a list of option group guids per row.
+    Extra fields in the raw records are ignored, missing ones are null.
+
+    Matches the old explode / collect_list / left join: option groups without a guid are left out, and an item with
+    no option groups (null or empty) gets null.
+    """
+    table = pa.Table.from_pylist(data, schema=MENU_ITEMS_ARROW_SCHEMA)
+    option_groups = table.column('optionGroups').combine_chunks()
+
+    # Guid of every option group, with the row it came from
+    option_group_guids = pc.struct_field(option_groups.flatten(), [0])
+    rows = pc.list_parent_indices(option_groups)
+
+    # Drop the option groups without a guid and rebuild the offsets from what's left per row
+    has_guid = option_group_guids.is_valid()
+    counts = np.bincount(rows.filter(has_guid).to_numpy(), minlength=len(option_groups))
+    offsets = pa.array(np.concatenate([[0], np.cumsum(counts)]), pa.int32())
+    no_option_groups = pc.equal(pc.fill_null(pc.list_value_length(option_groups), 0), 0)
+    option_group_guids = pa.ListArray.from_arrays(offsets, option_group_guids.filter(has_guid), mask=no_option_groups)
+
+    return table.drop(['optionGroups']).append_column('optionGroupGuids', option_group_guids)
+
+
+def preprocess_menu_items(data: list[dict[Any]], spark: 'pyspark.sql.SparkSession') -> 'pyspark.sql.DataFrame':
+    table = menu_items_to_arrow(data)
+    df = table.to_pandas()
+    # to_pandas gives numpy arrays for list cells, which createDataFrame only takes on the Arrow path. Python lists work
+    # either way, so a session without spark.sql.execution.arrow.pyspark.enabled (see get_spark_for_delta_s3) still runs.
+    df['optionGroupGuids'] = table.column('optionGroupGuids').to_pylist()
+    df = spark.createDataFrame(df, schema=MENU_ITEMS_SCHEMA)
 
     # Drop nulls
     df = df.dropna(subset='guid')
     # Convert orderableOnline to bool
     df = df.withColumn('orderableOnline', df.orderableOnline.cast('boolean'))
 
-    # optionGroups to array of guids
-    option_groups_exploded = df.select('guid', 'optionGroups').withColumn('optionGroups', explode('optionGroups'))
-    guid_vals = option_groups_exploded.select('guid', expr('optionGroups.guid').alias('option_group_guid'))
-    option_group_guid_lists = guid_vals.groupBy('guid').agg(
-        expr('collect_list(option_group_guid)').alias('optionGroupGuids'))
-
-    # Join the option group guids to the original dataframe
-    df = df.join(option_group_guid_lists, on='guid', how='left')
-
-    # Drop the optionGroups column
-    df = df.drop('optionGroups')
-
     # Drop duplicates, multiple locations will reference the same guids
     df = df.dropDuplicates()
 
     return df
-